@@ -0,0 +1,222 @@
+"""
+Concurrent validation of candidate endpoints.
+
+Each endpoint is checked for DNS resolution, TCP reachability and the
+app's own handshake (redis PING, memcached stats or zookeeper ruok),
+all endpoints at once on a thread pool, so a list takes about as long
+as its slowest endpoint.
+"""
+import collections
+import socket
+
+import common.install_utils as utils
+import common.resolver as resolver
+
+TIMEOUT = 3
+WORKERS = 32
+# bytes read from a handshake reply at most
+MAX_REPLY = 64 * 1024
+# how a redis server without, or with a wrong, password answers
+REDIS_AUTH_ERRORS = ('NOAUTH', 'WRONGPASS', 'ERR invalid password')
+
+# dns, tcp and handshake are True, False, or None when not checked
+# because an earlier step failed; detail says why the last one failed
+Check = collections.namedtuple(
+    'Check', ['endpoint', 'dns', 'tcp', 'handshake', 'detail'])
+
+
+class RedisReplyError(Exception):
+    """an error reply, like -NOAUTH Authentication required."""
+
+
+def check_endpoints(endpoints, kind, timeout=TIMEOUT):
+    """
+    Input:
+        endpoints []{}:
+            host and port, and auth for redis
+        kind string:
+            redis, memcached or zookeeper
+    Output:
+        checks []Check:
+            one per endpoint, in the same order
+    """
+    # every host once, before the endpoints need them
+    utils.resolve_hosts(endpoint['host'] for endpoint in endpoints)
+    return utils.parallel_map(
+        lambda endpoint: check_endpoint(endpoint, kind, timeout),
+        endpoints, WORKERS)
+
+
+def check_endpoint(endpoint, kind, timeout=TIMEOUT):
+    addresses = resolver.resolve(endpoint['host'])
+    if not addresses:
+        return Check(endpoint, False, None, None, 'does not resolve')
+
+    try:
+        sock = socket.create_connection(
+            (addresses[0], int(endpoint['port'])), timeout)
+    except socket.error as e:
+        return Check(endpoint, True, False, None, str(e))
+
+    try:
+        detail = HANDSHAKES[kind](sock, endpoint)
+    except socket.error as e:
+        detail = str(e) or 'timed out'
+    finally:
+        sock.close()
+    return Check(endpoint, True, True, detail is None, detail)
+
+
+def needs_auth(check):
+    """whether a redis check failed for a missing or wrong password"""
+    return bool(check.detail) and check.detail.startswith(REDIS_AUTH_ERRORS)
+
+
+# handshakes return None on success, or what went wrong
+def redis_ping(sock, endpoint):
+    """
+    PING, and INFO replication to set endpoint's slave key
+    to the server's current role
+    """
+    commands = [('PING',), ('INFO', 'replication')]
+    if endpoint.get('auth'):
+        commands.insert(0, ('AUTH', endpoint['auth']))
+    sock.sendall(b''.join(encode_redis(command) for command in commands))
+    reader = sock.makefile('rb')
+    try:
+        replies = [read_redis_reply(reader) for _ in commands]
+    except RedisReplyError as e:
+        return str(e)
+    except ValueError:
+        return 'unexpected reply'
+    finally:
+        reader.close()
+    if replies[-2] != 'PONG':
+        return 'no PONG reply'
+
+    for line in (replies[-1] or '').splitlines():
+        if line == 'role:slave':
+            endpoint['slave'] = True
+        elif line == 'role:master':
+            endpoint.pop('slave', None)
+    return None
+
+
+def redis_config_get(endpoint, parameter, timeout=TIMEOUT):
+    """
+    Input:
+        endpoint {}:
+            host and port of a redis server, and auth if it has one
+        parameter string:
+            a CONFIG GET parameter, like unixsocket
+    Output:
+        the parameter's value, None if the server cannot be asked
+        or does not answer with it
+    """
+    addresses = resolver.resolve(endpoint['host'])
+    if not addresses:
+        return None
+    commands = [('CONFIG', 'GET', parameter)]
+    if endpoint.get('auth'):
+        commands.insert(0, ('AUTH', endpoint['auth']))
+    try:
+        sock = socket.create_connection(
+            (addresses[0], int(endpoint['port'])), timeout)
+    except socket.error:
+        return None
+    try:
+        sock.sendall(
+            b''.join(encode_redis(command) for command in commands))
+        reader = sock.makefile('rb')
+        replies = [read_redis_reply(reader) for _ in commands]
+        reader.close()
+    except (socket.error, RedisReplyError, ValueError):
+        return None
+    finally:
+        sock.close()
+    reply = replies[-1]
+    if (not isinstance(reply, list) or len(reply) != 2 or
+            reply[0] != parameter):
+        return None
+    return reply[1]
+
+
+def read_redis_reply(reader):
+    """
+    Input:
+        reader file:
+            made from the socket with makefile('rb')
+    Output:
+        the next reply, a string, an int, None or a list of replies;
+        RedisReplyError is raised for an error reply
+    """
+    line = reader.readline(MAX_REPLY)
+    if not line.endswith(b'\r\n'):
+        raise socket.error('connection closed')
+    kind, payload = line[:1], line[1:-2].decode('utf-8', 'replace')
+    if kind == b'+':
+        return payload
+    if kind == b'-':
+        raise RedisReplyError(payload)
+    if kind == b':':
+        return int(payload)
+    if kind == b'$':
+        length = int(payload)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        if len(data) != length + 2:
+            raise socket.error('connection closed')
+        return data[:-2].decode('utf-8', 'replace')
+    if kind == b'*':
+        length = int(payload)
+        if length < 0:
+            return None
+        return [read_redis_reply(reader) for _ in range(length)]
+    raise ValueError('unexpected reply {!r}'.format(line))
+
+
+def encode_redis(command):
+    parts = ['*{}\r\n'.format(len(command))]
+    for arg in command:
+        parts.append('${}\r\n{}\r\n'.format(len(arg.encode('utf-8')), arg))
+    return ''.join(parts).encode('utf-8')
+
+
+def memcached_stats(sock, endpoint):
+    sock.sendall(b'stats\r\n')
+    reply = read_until(sock, (b'END\r\n', b'ERROR\r\n'))
+    if not reply.startswith(b'STAT '):
+        return 'no stats reply'
+    return None
+
+
+def zookeeper_ruok(sock, endpoint):
+    sock.sendall(b'ruok')
+    # zookeeper closes the connection after its answer
+    reply = read_until(sock, ())
+    if reply == b'imok':
+        return None
+    if b'whitelist' in reply:
+        return 'ruok is not in 4lw.commands.whitelist'
+    return 'no imok reply'
+
+
+def read_until(sock, endings):
+    """the bytes sock sends until one of endings or the connection closes"""
+    reply = b''
+    while len(reply) < MAX_REPLY:
+        data = sock.recv(4096)
+        if not data:
+            break
+        reply += data
+        if reply.endswith(tuple(endings)):
+            break
+    return reply
+
+
+HANDSHAKES = {
+    'redis': redis_ping,
+    'memcached': memcached_stats,
+    'zookeeper': zookeeper_ruok,
+}
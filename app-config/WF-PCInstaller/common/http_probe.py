@@ -0,0 +1,139 @@
+"""
+In-process HTTP probe for validating the urls users enter.
+
+One GET per url, with separate connect and read timeouts, following
+redirects and reading at most a bounded part of the body.  Connections
+are kept alive and reused per scheme, host and port, so checking
+several status pages of one server opens a single TCP connection.
+Safe to call from several threads.
+"""
+import collections
+import socket
+import threading
+
+# python 2/3 compatibility
+try:
+    import http.client as http_client
+    from urllib.parse import urljoin, urlsplit
+except ImportError:
+    import httplib as http_client
+    from urlparse import urljoin, urlsplit
+
+CONNECT_TIMEOUT = 3
+READ_TIMEOUT = 5
+MAX_BODY = 64 * 1024
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+USER_AGENT = 'wavefront-installer'
+
+# version is like HTTP/1.1; body is the decoded text of at most
+# max_body bytes; url is the last url requested, after redirects
+Response = collections.namedtuple(
+    'Response', ['status', 'reason', 'version', 'headers', 'body', 'url'])
+
+_lock = threading.Lock()
+# (scheme, host, port): idle connection
+_connections = {}
+
+
+def probe(url, max_body=MAX_BODY, connect_timeout=CONNECT_TIMEOUT,
+          read_timeout=READ_TIMEOUT, max_redirects=MAX_REDIRECTS):
+    """
+    Input:
+        url string:
+            an http or https url
+    Output:
+        response Response:
+            the final response, or None if the url is not http,
+            cannot be reached or redirects too often
+    """
+    for _ in range(max_redirects + 1):
+        response = request(url, max_body, connect_timeout, read_timeout)
+        if response is None:
+            return None
+        location = response.headers.get('location')
+        if response.status not in REDIRECT_STATUSES or not location:
+            return response
+        url = urljoin(url, location)
+    return None
+
+
+def request(url, max_body, connect_timeout, read_timeout):
+    """a single GET of url, see probe"""
+    parts = urlsplit(url)
+    if parts.scheme == 'https':
+        connection_class = http_client.HTTPSConnection
+    elif parts.scheme == 'http':
+        connection_class = http_client.HTTPConnection
+    else:
+        return None
+    if not parts.hostname:
+        return None
+    try:
+        port = parts.port
+    except ValueError:
+        return None
+    key = (parts.scheme, parts.hostname, port)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+
+    with _lock:
+        connection = _connections.pop(key, None)
+    # a kept alive connection may have been closed by the server
+    # since, so it gets one retry on a fresh connection
+    for reused in ((True, False) if connection is not None else (False,)):
+        if not reused:
+            connection = connection_class(
+                parts.hostname, port, timeout=connect_timeout)
+        try:
+            if connection.sock is None:
+                connection.connect()
+                connection.sock.settimeout(read_timeout)
+            connection.request(
+                'GET', path, headers={'User-Agent': USER_AGENT})
+            raw = connection.getresponse()
+            body = raw.read(max_body)
+            break
+        except (http_client.HTTPException, socket.error) as e:
+            connection.close()
+            if not reused or isinstance(e, socket.timeout):
+                return None
+
+    # keep the connection only if the whole body was read
+    if raw.will_close or not raw.isclosed():
+        connection.close()
+    else:
+        with _lock:
+            idle = _connections.setdefault(key, connection)
+        if idle is not connection:
+            connection.close()
+
+    headers = dict(
+        (name.lower(), value) for name, value in raw.getheaders())
+    return Response(
+        raw.status, raw.reason,
+        'HTTP/1.0' if raw.version == 10 else 'HTTP/1.1',
+        headers, decode_body(body, headers.get('content-type', '')), url)
+
+
+def decode_body(body, content_type):
+    """body as text in the charset of content_type, utf-8 by default"""
+    charset = 'utf-8'
+    for param in content_type.split(';')[1:]:
+        name, _, value = param.strip().partition('=')
+        if name.lower() == 'charset' and value:
+            charset = value.strip('"\'')
+    try:
+        return body.decode(charset, 'replace')
+    except LookupError:
+        return body.decode('utf-8', 'replace')
+
+
+def close_connections():
+    """close the idle kept alive connections"""
+    with _lock:
+        connections = list(_connections.values())
+        _connections.clear()
+    for connection in connections:
+        connection.close()
@@ -0,0 +1,147 @@
+"""
+Structured installer log.
+
+Each record is a JSON line with a timestamp, the phase and plugin it
+belongs to and an event, and phases log their duration when they end.
+Records are appended to config.INSTALL_LOG, the log install.sh writes
+to, through one file handle, and are buffered until a phase starts or
+ends, so the output of commands that append to the same log is not
+cut into by a record.
+"""
+import atexit
+import contextlib
+import json
+import sys
+import threading
+import time
+
+import common.config as config
+
+_lock = threading.Lock()
+# the open log, None until the first record, False if it cannot be opened
+_log = None
+# [(phase, plugin)] of the phases in progress, innermost last
+_phases = []
+
+
+def get_log():
+    """the open INSTALL_LOG, or None when there is none"""
+    global _log
+    if _log is None:
+        if not config.INSTALL_LOG:
+            return None
+        try:
+            _log = open(config.INSTALL_LOG, 'a')
+        except (IOError, OSError) as e:
+            sys.stderr.write(
+                'Cannot open {}: {}\n'.format(config.INSTALL_LOG, e))
+            _log = False
+        else:
+            atexit.register(close)
+    return _log or None
+
+
+def timestamp():
+    now = time.time()
+    return '{}.{:03d}Z'.format(
+        time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(now)),
+        int(now % 1 * 1000))
+
+
+def log(event, **fields):
+    """
+    Input:
+        event string:
+            what happened, like 'phase start' or an error message
+        fields {}:
+            extra json values of the record
+
+    Description:
+        buffers one record in the current phase and plugin,
+        unless fields name them
+    """
+    with _lock:
+        phase, plugin = _phases[-1] if _phases else (None, None)
+        record = {
+            'time': timestamp(),
+            'phase': phase,
+            'plugin': plugin,
+            'event': event}
+        record.update(fields)
+        out = get_log()
+        if out is None:
+            return
+        try:
+            out.write(json.dumps(record, sort_keys=True, default=str))
+            out.write('\n')
+        except (IOError, OSError, ValueError):
+            pass
+
+
+def flush():
+    """
+    write the buffered records, before running a command
+    that appends to the log itself
+    """
+    with _lock:
+        if _log:
+            try:
+                _log.flush()
+            except (IOError, OSError, ValueError):
+                pass
+
+
+def close():
+    global _log
+    flush()
+    with _lock:
+        if _log:
+            _log.close()
+        _log = None
+
+
+def describe(e):
+    try:
+        return str(e)
+    except UnicodeError:
+        # a python 2 exception with non-ascii unicode text
+        return repr(e)
+
+
+@contextlib.contextmanager
+def phase(name, plugin=None):
+    """
+    Input:
+        name string:
+            the phase, like detect or check_dependency
+        plugin string:
+            the configurator running it, the enclosing
+            phase's if not given
+
+    Description:
+        logs the start and end of the phase, with its duration
+        and the exception that ended it, if any, and flushes
+        the log at both
+    """
+    if plugin is None and _phases:
+        plugin = _phases[-1][1]
+    _phases.append((name, plugin))
+    log('phase start')
+    flush()
+    start = time.time()
+    try:
+        yield
+    except SystemExit as e:
+        log('phase exited',
+            duration=round(time.time() - start, 3), code=e.code)
+        raise
+    except BaseException as e:
+        log('phase failed',
+            duration=round(time.time() - start, 3),
+            error=type(e).__name__, message=describe(e))
+        raise
+    else:
+        log('phase done', duration=round(time.time() - start, 3))
+    finally:
+        flush()
+        _phases.pop()
@@ -7,6 +7,11 @@ import random
 import socket
 import string
 import re
+from multiprocessing.pool import ThreadPool
+
+import common.http_probe as http_probe
+import common.resolver as resolver
+import common.terminal as terminal
 # python 2/3 compatibility
 try:
     from urllib.parse import urlparse as url_p
@@ -161,47 +166,43 @@ def string_to_num(s):
 
 # helper functions converted from one line script utils to python callable
 def print_warn(msg):
-    call_command('tput setaf 3')  # 3 = yellow
-    sys.stdout.write('[ WARNING ]\n')
-    call_command('tput sgr0')
-    sys.stderr.write(msg + '\n')
+    terminal.write(
+        terminal.colored('[ WARNING ]', YELLOW, sys.stdout) + '\n',
+        sys.stdout)
+    terminal.write(msg + '\n', sys.stderr)
 
 
 def print_reminder(msg):
-    call_command('tput setaf 5')  # 5 = magenta
-    sys.stderr.write(msg + '\n')
-    call_command('tput sgr0')
+    print_color_msg(msg, MAGENTA)
 
 
 def print_color_msg(msg, color):
-    call_command('tput setaf {}'.format(color))
-    sys.stderr.write(msg + '\n')
-    call_command('tput sgr0')
+    terminal.write(
+        terminal.colored(msg, color, sys.stderr) + '\n', sys.stderr)
 
 
 def print_failure():
-    call_command('tput setaf 1')  # 1 = red
-    print_right('[ FAILED ]')
-    call_command('tput sgr0')
+    print_right('[ FAILED ]', RED)
 
 
 def print_success():
-    call_command('tput setaf 2')  # 2 = green
-    print_right('[ OK ]')
-    call_command('tput sgr0')
+    print_right('[ OK ]', GREEN)
 
 
 def print_step(msg):
-    call_command('tput setaf 6')
-    sys.stdout.write(msg + '\n')
-    call_command('tput sgr0')
+    terminal.write(
+        terminal.colored(msg, CYAN, sys.stdout) + '\n', sys.stdout)
 
 
-def print_right(msg):
-    call_command('tput cuu1')
-    call_command('tput cuf $(tput cols)')
-    call_command('tput cub %d' % len(msg))
-    sys.stdout.write(msg + '\n')
+def print_right(msg, color=None):
+    """
+    write msg at the right end of the line just written,
+    in color if given
+    """
+    text = terminal.right_aligned(msg, sys.stdout)
+    if color is not None:
+        text = terminal.colored(text, color, sys.stdout)
+    terminal.write(text + '\n', sys.stdout)
 
 
 def exit_with_message(msg):
@@ -214,6 +215,22 @@ def exit_with_failure(msg):
     exit_with_message(msg)
 
 
+def parallel_map(func, items, workers):
+    """
+    map func over items on up to workers threads, for
+    work that mostly waits on I/O
+    """
+    items = list(items)
+    if len(items) < 2:
+        return [func(item) for item in items]
+    pool = ThreadPool(min(workers, len(items)))
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
 # utils using subprocess
 def call_command(command):
     """
@@ -253,14 +270,6 @@ def get_command_output(command):
     return res
 
 
-def append_to_log(msg, log):
-    res = call_command(
-        'echo -e "\n{msg}" >> {log}'.format(
-            msg=msg, log=log))
-    if res != 0:
-        raise Exception('Failed to write to log.')
-
-
 # utils using os
 def check_path_exists(path, expand=False, debug=False):
     if expand:
@@ -284,30 +293,36 @@ def write_file(filepath, msg):
 
 
 def get_http_status(url):
-    status_cmd = 'curl --head -s ' + url + ' | head -n 1'
-    return get_command_output(status_cmd)
+    """
+    Output:
+        the status line of the response to a GET of url,
+        e.g. HTTP/1.1 200 OK, or None if it cannot be reached
+    """
+    res = http_probe.probe(url)
+    if res is None:
+        return None
+    return '{} {} {}'.format(res.version, res.status, res.reason)
 
 
 def get_http_return_code(http_res):
     """
     Input:
-        http_res string:
-            http response header
+        http_res string or http_probe.Response:
+            http status line or response
     Output:
         the appropriate code
     """
-    http_status_re = re.match('HTTP/1.1 (\d* [\w ]*)\s', http_res)
-    if http_status_re is None:
-        return INVALID_URL
-
-    http_code = http_status_re.group(1)
-
-    if('401 Unauthorized' in http_code):
-        return NOT_AUTH
-    elif('404 Not Found' in http_code):
-        return NOT_FOUND
-    elif('200 OK' in http_code):
-        return HTTP_OK
+    if isinstance(http_res, http_probe.Response):
+        http_code = http_res.status
+    else:
+        # HTTP/1.0, HTTP/1.1 and HTTP/2 status lines
+        http_status_re = re.match(r'HTTP/[\d.]+ (\d{3})\b', http_res)
+        if http_status_re is None:
+            return INVALID_URL
+        http_code = int(http_status_re.group(1))
+
+    if http_code in (NOT_AUTH, NOT_FOUND, HTTP_OK):
+        return http_code
     else:
         return INVALID_URL
 
@@ -339,7 +354,7 @@ def check_url_scheme(url):
         True if the url contains scheme
         False otherwise
     """
-    parsed = url_p.urlparse(url)
+    parsed = url_p(url)
     if not parsed.scheme:
         return False
     return True
@@ -385,11 +400,23 @@ def hostname_resolves(hostname):
         True if host is resolvable
         False otherwise
     """
-    try:
-        socket.gethostbyname(hostname)
-        return True
-    except socket.error:
+    if not hostname:
         return False
+    return bool(resolver.resolve(hostname))
+
+
+def resolve_hosts(hostnames):
+    """
+    Input:
+        hostnames []string
+    Output:
+        addresses {hostname: []string}:
+            the addresses of each hostname, [] if it does not
+            resolve, looked up concurrently
+    """
+    hostnames = list(set(hostnames))
+    return dict(zip(
+        hostnames, parallel_map(resolver.resolve, hostnames, 16)))
 
 
 def is_valid_ipv4_address(address):
@@ -0,0 +1,496 @@
+"""
+Process table helpers for app detection.
+
+Reads /proc directly, in one pass, instead of forking ps.  Systems
+without a Linux /proc fall back to parsing ps.  Listening sockets are
+read from /proc/net and traced back to their processes through
+/proc/<pid>/fd.  Processes in another network namespace, like
+containers, have their sockets read from their own /proc/<pid>/net.
+"""
+import collections
+import os
+import re
+import socket
+import struct
+
+import common.install_utils as utils
+
+try:
+    import pwd
+except ImportError:
+    pwd = None
+
+PROC_DIR = '/proc'
+# an alternative of a pattern that ProcessMatcher treats as literal text
+LITERAL_RE = re.compile(r'^[\w\-.:/]+$')
+
+# st column of a listening socket in /proc/net/tcp and tcp6
+TCP_LISTEN = '0A'
+# __SO_ACCEPTCON, the Flags bit of a listening socket in /proc/net/unix
+UNIX_ACCEPTCON = 0x10000
+# addresses a socket listens on for every interface
+ANY_ADDRESSES = ('0.0.0.0', '::')
+# a docker, containerd or cri-o container id in /proc/<pid>/cgroup
+CONTAINER_ID_RE = re.compile(r'[0-9a-f]{64}')
+# threads reading processes and network namespaces
+SCAN_WORKERS = 8
+
+# cmdline is the argument vector joined by spaces, as ps -ef shows it
+Process = collections.namedtuple('Process', ['pid', 'user', 'comm', 'cmdline'])
+# family is tcp, tcp6 or unix; address is the ip, or the path of a unix
+# socket, whose port is None; container is the short container id of
+# the process or None
+Listener = collections.namedtuple(
+    'Listener', ['pid', 'family', 'address', 'port', 'container'])
+
+
+def list_processes(proc_dir=PROC_DIR):
+    """
+    Input:
+        proc_dir string:
+            mount point of procfs
+    Output:
+        a list of Process, one for each user space process
+        that was readable.  Kernel threads and zombies, which
+        have no cmdline, are left out.
+    """
+    if not os.path.isdir(os.path.join(proc_dir, 'self')):
+        return list_processes_ps()
+
+    users = {}
+    processes = []
+    for entry in os.listdir(proc_dir):
+        if not entry.isdigit():
+            continue
+
+        path = os.path.join(proc_dir, entry)
+        try:
+            with open(os.path.join(path, 'cmdline'), 'rb') as cmd_file:
+                raw_cmdline = cmd_file.read()
+            if not raw_cmdline:
+                continue
+            with open(os.path.join(path, 'comm'), 'rb') as comm_file:
+                comm = comm_file.read()
+            uid = os.stat(path).st_uid
+        except (IOError, OSError):
+            # the process exited while we were looking
+            continue
+
+        if uid not in users:
+            users[uid] = get_user_name(uid)
+        cmdline = raw_cmdline.rstrip(b'\0').replace(b'\0', b' ')
+        processes.append(Process(
+            int(entry), users[uid],
+            comm.rstrip(b'\n').decode('utf-8', 'replace'),
+            cmdline.decode('utf-8', 'replace')))
+
+    return processes
+
+
+def list_processes_ps():
+    """
+    Same as list_processes for systems without procfs.
+    comm is the basename of the first word of cmdline.
+    """
+    res = utils.get_command_output('ps -eo pid=,user=,args=')
+    if res is None:
+        return []
+
+    processes = []
+    for line in res.decode('utf-8', 'replace').split('\n'):
+        fields = line.split(None, 2)
+        if len(fields) < 3:
+            continue
+        pid, user, cmdline = fields
+        comm = os.path.basename(cmdline.split()[0])
+        processes.append(Process(int(pid), user, comm, cmdline))
+    return processes
+
+
+def get_user_name(uid):
+    if pwd is not None:
+        try:
+            return pwd.getpwuid(uid).pw_name
+        except KeyError:
+            pass
+    return str(uid)
+
+
+def read_listening_sockets(net_dir=os.path.join(PROC_DIR, 'net')):
+    """
+    Input:
+        net_dir string:
+            the /proc/net (or /proc/<pid>/net) directory to read
+    Output:
+        sockets {inode: (family, address, port)}:
+            every listening TCP and unix socket of the network
+            namespace, keyed by socket inode
+    """
+    sockets = {}
+    for family in ('tcp', 'tcp6'):
+        for fields in read_net_table(os.path.join(net_dir, family)):
+            # sl local_address rem_address st tx:rx tr:when retrnsmt uid
+            # timeout inode
+            if len(fields) < 10 or fields[3] != TCP_LISTEN:
+                continue
+            address, _, port = fields[1].partition(':')
+            sockets[int(fields[9])] = (
+                family, decode_address(address), int(port, 16))
+
+    for fields in read_net_table(os.path.join(net_dir, 'unix')):
+        # Num RefCount Protocol Flags Type St Inode Path
+        if len(fields) < 8 or not int(fields[3], 16) & UNIX_ACCEPTCON:
+            continue
+        sockets[int(fields[6])] = ('unix', fields[7], None)
+    return sockets
+
+
+def read_net_table(path):
+    """The rows of a /proc/net table split into fields, header left out"""
+    try:
+        with open(path) as net_file:
+            lines = net_file.readlines()
+    except (IOError, OSError):
+        return []
+    return [line.split() for line in lines[1:]]
+
+
+def decode_address(hex_address):
+    """
+    Input:
+        hex_address string:
+            an address of /proc/net/tcp or tcp6, the bytes of the ip
+            in hex, as 32-bit words in host byte order
+    Output:
+        the ip in text form
+    """
+    words = [int(hex_address[i:i + 8], 16)
+             for i in range(0, len(hex_address), 8)]
+    packed = struct.pack('={}I'.format(len(words)), *words)
+    if len(words) == 1:
+        return socket.inet_ntop(socket.AF_INET, packed)
+    address = socket.inet_ntop(socket.AF_INET6, packed)
+    # an ipv4 client of a dual stack socket
+    if address.startswith('::ffff:') and '.' in address:
+        return address[len('::ffff:'):]
+    return address
+
+
+def read_local_addresses(net_dir):
+    """
+    Output:
+        addresses []string:
+            the non loopback ipv4 addresses of the network
+            namespace, from its fib_trie
+    """
+    addresses = []
+    address = None
+    try:
+        with open(os.path.join(net_dir, 'fib_trie')) as trie_file:
+            for line in trie_file:
+                line = line.strip()
+                if line.startswith('|--'):
+                    address = line.split()[1]
+                elif (line == '/32 host LOCAL' and
+                        not address.startswith('127.') and
+                        address not in addresses):
+                    addresses.append(address)
+    except (IOError, OSError):
+        pass
+    return addresses
+
+
+def get_net_namespace(pid, proc_dir=PROC_DIR):
+    """the network namespace of a process, like net:[4026531993]"""
+    try:
+        return os.readlink(os.path.join(proc_dir, str(pid), 'ns', 'net'))
+    except (IOError, OSError):
+        return None
+
+
+def get_container_id(pid, proc_dir=PROC_DIR):
+    """
+    Output:
+        the 12 character id of the container the process runs
+        in, taken from its cgroup, or None
+    """
+    try:
+        with open(os.path.join(proc_dir, str(pid), 'cgroup')) as cgroup:
+            ids = CONTAINER_ID_RE.findall(cgroup.read())
+    except (IOError, OSError):
+        return None
+    if ids:
+        return ids[-1][:12]
+    return None
+
+
+def get_socket_inodes(pid, proc_dir=PROC_DIR):
+    """the inodes of the sockets a process has open"""
+    fd_dir = os.path.join(proc_dir, str(pid), 'fd')
+    try:
+        fds = os.listdir(fd_dir)
+    except (IOError, OSError):
+        # gone, or not ours to look at without root
+        return []
+
+    inodes = []
+    for fd in fds:
+        try:
+            target = os.readlink(os.path.join(fd_dir, fd))
+        except (IOError, OSError):
+            continue
+        if target.startswith('socket:['):
+            inodes.append(int(target[len('socket:['):-1]))
+    return inodes
+
+
+def find_listeners(pids, proc_dir=PROC_DIR, namespaces=None):
+    """
+    Input:
+        pids []int:
+            the processes to look for
+        namespaces {}:
+            network namespace: (sockets, addresses), filled in
+            as namespaces are read so calls can share it
+    Output:
+        listeners []Listener:
+            the sockets the processes listen on, in pids order,
+            each socket once even if several processes share it
+
+    Description:
+        A process in another network namespace than ours, like
+        a container, is only reachable at its namespace's own
+        address.  Its sockets on every interface get that address,
+        and its loopback and unix sockets are left out.
+    """
+    if namespaces is None:
+        namespaces = {}
+    own_namespace = get_net_namespace('self', proc_dir)
+
+    def inspect(pid):
+        return (pid, get_net_namespace(pid, proc_dir),
+                get_container_id(pid, proc_dir),
+                get_socket_inodes(pid, proc_dir))
+    # /proc reads mostly wait on the kernel
+    processes = utils.parallel_map(inspect, pids, SCAN_WORKERS)
+
+    # read each namespace once, through one of its processes
+    unread = {}
+    for pid, namespace, _, _ in processes:
+        if namespace not in namespaces:
+            unread.setdefault(namespace, pid)
+
+    def read_namespace(namespace):
+        net_dir = os.path.join(proc_dir, str(unread[namespace]), 'net')
+        if namespace is None:
+            net_dir = os.path.join(proc_dir, 'net')
+        return (read_listening_sockets(net_dir),
+                read_local_addresses(net_dir))
+    namespaces.update(zip(
+        unread, utils.parallel_map(read_namespace, unread, SCAN_WORKERS)))
+
+    listeners = []
+    seen = set()
+    for pid, namespace, container, inodes in processes:
+        sockets, addresses = namespaces[namespace]
+        isolated = namespace not in (None, own_namespace)
+        for inode in inodes:
+            if inode not in sockets or inode in seen:
+                continue
+            seen.add(inode)
+            family, address, port = sockets[inode]
+            if isolated:
+                if family == 'unix' or is_loopback(address):
+                    continue
+                if address in ANY_ADDRESSES:
+                    if not addresses:
+                        continue
+                    address = addresses[0]
+            listeners.append(
+                Listener(pid, family, address, port, container))
+    return listeners
+
+
+def is_loopback(address):
+    return address.startswith('127.') or address == '::1'
+
+
+def connect_host(listener, def_host='127.0.0.1'):
+    """
+    Output:
+        the host to reach a TCP listener at: def_host if it
+        listens on every interface, its address otherwise
+    """
+    if listener.address in ANY_ADDRESSES:
+        return def_host
+    return listener.address
+
+
+class ProcessMatcher(object):
+    """
+    Search cmdlines for many named patterns in a single scan.
+
+    Alternatives made only of literal text (letters, digits and
+    - _ . : /), like "apache2|httpd", go into one prefix tree regex,
+    tried as a lookahead at every position of the text so overlapping
+    literals are all found.  It matches the longest literal at each
+    position, and that literal is looked up to find the names of
+    every literal inside it.  Its cost barely grows with the number
+    of literals, where an alternation of named groups grows linearly.  Other
+    alternatives are searched as one alternation of named groups,
+    and only when it matches are they searched one by one, since an
+    alternation reports just one of the patterns matching at a place.
+    Note that '.' in a literal alternative only matches a dot.
+    """
+    # python 2 allows at most 100 named groups per regex
+    MAX_GROUPS = 90
+
+    def __init__(self, patterns):
+        """
+        Input:
+            patterns [](name, regex string):
+                what to search each cmdline for
+        """
+        self.literals = {}
+        regexes = []
+        for name, pattern in patterns:
+            for alternative in split_alternatives(pattern):
+                if LITERAL_RE.match(alternative):
+                    self.literals.setdefault(alternative, set()).add(name)
+                else:
+                    regexes.append((name, alternative))
+
+        # literal: the names of every literal it contains
+        self.contained = {}
+        for literal in self.literals:
+            self.contained[literal] = set()
+            for other, names in self.literals.items():
+                if other in literal:
+                    self.contained[literal].update(names)
+
+        self.literal_re = None
+        if self.literals:
+            self.literal_re = re.compile(
+                '(?=({}))'.format(build_trie_regex(self.literals)))
+
+        # [](alternation, [](name, regex)) of MAX_GROUPS patterns each
+        self.regexes = []
+        for start in range(0, len(regexes), self.MAX_GROUPS):
+            chunk = regexes[start:start + self.MAX_GROUPS]
+            alternatives = [
+                '(?P<p{i}>{pattern})'.format(i=i, pattern=pattern)
+                for i, (_, pattern) in enumerate(chunk)]
+            self.regexes.append((
+                re.compile('|'.join(alternatives)),
+                [(name, re.compile(pattern)) for name, pattern in chunk]))
+
+    def match(self, text):
+        """
+        Output:
+            the set of names with a pattern found in text
+        """
+        found = set()
+        if self.literal_re is not None:
+            for literal in self.literal_re.findall(text):
+                found.update(self.contained[literal])
+        for alternation, patterns in self.regexes:
+            if alternation.search(text) is None:
+                continue
+            for name, regex in patterns:
+                if name not in found and regex.search(text):
+                    found.add(name)
+        return found
+
+    def match_processes(self, processes, exclude=None):
+        """
+        Input:
+            processes []Process:
+                the process table, see list_processes
+            exclude regex:
+                processes whose cmdline matches are skipped
+        Output:
+            matches {name: []Process}:
+                the processes found for each name with at least one match
+        """
+        matches = {}
+        for process in processes:
+            if exclude is not None and exclude.search(process.cmdline):
+                continue
+            for name in self.match(process.cmdline):
+                matches.setdefault(name, []).append(process)
+        return matches
+
+
+def split_alternatives(pattern):
+    """
+    Split a regex on its top level '|', leaving the ones inside
+    groups, character classes and escapes alone.
+    """
+    alternatives = []
+    start = 0
+    depth = 0
+    in_class = False
+    escaped = False
+    for i, char in enumerate(pattern):
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            alternatives.append(pattern[start:i])
+            start = i + 1
+    alternatives.append(pattern[start:])
+    return alternatives
+
+
+def build_trie_regex(words):
+    """
+    Input:
+        words []string:
+            literal strings
+    Output:
+        a regex matching any of the words, factored by common prefix,
+        e.g. apache2, apachectl, httpd -> (?:apache(?:2|ctl)|httpd)
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        # end of a word
+        node[''] = None
+
+    def emit(node):
+        alternatives = []
+        optional = False
+        for char in sorted(node):
+            if char == '':
+                optional = True
+            else:
+                alternatives.append(re.escape(char) + emit(node[char]))
+        if not alternatives:
+            return ''
+        if len(alternatives) == 1:
+            body = alternatives[0]
+        else:
+            body = '(?:{})'.format('|'.join(alternatives))
+        # a word ending here may also continue into a longer one
+        if optional:
+            return '(?:{})?'.format(body)
+        return body
+
+    return emit(trie)
+
+
+if __name__ == '__main__':
+    for process in list_processes():
+        utils.cprint('{0.pid:>7} {0.user:<12} {0.comm:<16} {0.cmdline}'.format(
+            process))
@@ -0,0 +1,74 @@
+"""
+Process wide hostname resolution cache.
+
+Lookups go through getaddrinfo, so ipv6 only hosts resolve too.
+Answers are kept for TTL seconds and failures for NEGATIVE_TTL, and a
+host being resolved by one thread is waited on, not resolved again,
+by the others.
+"""
+import socket
+import threading
+import time
+
+TTL = 300
+NEGATIVE_TTL = 30
+
+_lock = threading.Lock()
+# host: (expiry, addresses), addresses being [] for a failed lookup
+_cache = {}
+# host: threading.Event set when its lookup in progress is done
+_pending = {}
+
+
+def resolve(host):
+    """
+    Input:
+        host string:
+            hostname or ip address
+    Output:
+        addresses []string:
+            the ipv4 and ipv6 addresses of host, in getaddrinfo
+            order without repeats, [] if it does not resolve
+    """
+    while True:
+        with _lock:
+            cached = _cache.get(host)
+            if cached is not None and cached[0] > time.time():
+                return cached[1]
+            pending = _pending.get(host)
+            if pending is None:
+                pending = _pending[host] = threading.Event()
+                break
+        # another thread is resolving host
+        pending.wait()
+
+    addresses = []
+    try:
+        addresses = lookup(host)
+    finally:
+        ttl = TTL if addresses else NEGATIVE_TTL
+        with _lock:
+            _cache[host] = (time.time() + ttl, addresses)
+            del _pending[host]
+        pending.set()
+    return addresses
+
+
+def lookup(host):
+    """resolve host without the cache"""
+    try:
+        infos = socket.getaddrinfo(host, None, 0, socket.SOCK_STREAM)
+    except (socket.error, UnicodeError):
+        return []
+    addresses = []
+    for info in infos:
+        address = info[4][0]
+        if address not in addresses:
+            addresses.append(address)
+    return addresses
+
+
+def clear():
+    """forget every cached answer"""
+    with _lock:
+        _cache.clear()
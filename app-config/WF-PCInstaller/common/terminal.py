@@ -0,0 +1,111 @@
+"""
+Terminal rendering for the installer's messages.
+
+The terminfo sequences and the terminal width are looked up once,
+with curses, instead of forking tput for every color change.  A
+stream that is not a terminal, or a terminal curses does not know,
+gets plain text.  Each message is written with one write and flush.
+"""
+import sys
+
+try:
+    import curses
+except ImportError:
+    curses = None
+
+# terminfo capabilities used, see terminfo(5)
+CAPABILITIES = ['setaf', 'sgr0', 'cuu1', 'cuf', 'cub']
+DEFAULT_COLUMNS = 80
+
+# capability: sequence, plus 'cols', once looked up; empty if plain
+_terminfo = None
+# fileno: isatty
+_ttys = {}
+
+
+def get_terminfo():
+    """
+    Output:
+        terminfo {}:
+            the sequences of CAPABILITIES as text and the column
+            count under 'cols', or {} when there is no usable terminal
+    """
+    global _terminfo
+    if _terminfo is not None:
+        return _terminfo
+
+    _terminfo = {}
+    if curses is None:
+        return _terminfo
+    for stream in (sys.stdout, sys.stderr):
+        if is_tty(stream):
+            try:
+                curses.setupterm(fd=stream.fileno())
+            except curses.error:
+                return _terminfo
+            break
+    else:
+        return _terminfo
+
+    terminfo = {}
+    for name in CAPABILITIES:
+        sequence = curses.tigetstr(name)
+        if not sequence:
+            # a dumb terminal, stay plain
+            return _terminfo
+        terminfo[name] = sequence
+    cols = curses.tigetnum('cols')
+    terminfo['cols'] = cols if cols > 0 else DEFAULT_COLUMNS
+    _terminfo = terminfo
+    return _terminfo
+
+
+def is_tty(stream):
+    try:
+        fileno = stream.fileno()
+    except (AttributeError, IOError, OSError, ValueError):
+        # replaced by something that is not a file
+        return False
+    if fileno not in _ttys:
+        _ttys[fileno] = stream.isatty()
+    return _ttys[fileno]
+
+
+def sequence(name, *params):
+    """the text of a terminfo capability, '' when plain"""
+    terminfo = get_terminfo()
+    if name not in terminfo:
+        return ''
+    if params:
+        value = curses.tparm(terminfo[name], *params)
+    else:
+        value = terminfo[name]
+    return value.decode('latin-1')
+
+
+def colored(msg, color, stream=None):
+    """msg in the setaf color, for writing to stream (stdout)"""
+    if not is_tty(stream or sys.stdout):
+        return msg
+    return sequence('setaf', color) + msg + sequence('sgr0')
+
+
+def right_aligned(msg, stream=None):
+    """
+    msg moved to the right end of the previous line,
+    or as is when plain
+    """
+    if not is_tty(stream or sys.stdout):
+        return msg
+    terminfo = get_terminfo()
+    if not terminfo:
+        return msg
+    return (
+        sequence('cuu1') + sequence('cuf', terminfo['cols']) +
+        sequence('cub', len(msg)) + msg)
+
+
+def write(text, stream=None):
+    stream = stream or sys.stdout
+    stream.write(text)
+    stream.flush()
@@ -4,6 +4,7 @@ Tested with cassandra 3.7.0 (Ubuntu 14.04)
 import re
 
 import common.install_utils as utils
+import common.install_log as install_log
 import plugin_dir.plugin_installer as inst
 import common.config as config
 
@@ -39,9 +40,9 @@ class CassandraConfigurator(inst.PluginInstaller):
         for line in ldd_out.split('\n'):
             libjvm_re = re.search(r'libjvm.so(.*?)not found', line)
             if libjvm_re is not None:
-                utils.call_command(
-                    'echo Missing libjvm dependency for collectd java plugin '
-                    '>>{log}'.format(log=config.INSTALL_LOG))
+                install_log.log(
+                    'Missing libjvm dependency for collectd java plugin',
+                    ldd=line.strip())
                 self.raise_error(
                     'Missing libjvm dependency for collectd java plugin.')
         utils.print_success()
@@ -5,6 +5,7 @@ import common.install_utils as utils
 import common.config as config
 import plugin_dir.plugin_installer as inst
 import plugin_dir.utils.plugin_utils as p_utils
+import plugin_dir.utils.discovery_utils as d_utils
 
 
 class MemcachedConfigurator(inst.PluginInstaller):
@@ -46,6 +47,16 @@ class MemcachedConfigurator(inst.PluginInstaller):
         iname_list = []
         server_list = []
 
+        # instances found from the running memcached processes
+        found = self.confirm_discovered(
+            d_utils.discover_memcached(self.processes, self.listeners),
+            d_utils.describe, kind='memcached')
+        for instance in found:
+            iname = d_utils.instance_name('memcached', instance, iname_list)
+            iname_list.append(iname)
+            server_list.append((instance['host'], instance['port']))
+            data[iname] = instance
+
         while utils.ask('\nWould you like to add a server to monitor?'):
             iname = utils.prompt_and_check_input(
                 prompt=(
@@ -58,7 +69,8 @@ class MemcachedConfigurator(inst.PluginInstaller):
                     '{} has already been used.'.format),
                 usage_fmt=True).replace(" ", "")
 
-            (host, port) = p_utils.get_host_and_port(def_port='11211')
+            (host, port) = p_utils.get_host_and_port(
+                *self.suggest_address(def_port='11211', taken=server_list))
 
             if (host, port) in server_list:
                 utils.eprint(
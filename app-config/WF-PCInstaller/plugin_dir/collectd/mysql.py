@@ -5,6 +5,7 @@ import re
 
 import common.install_utils as utils
 import plugin_dir.plugin_installer as inst
+import plugin_dir.utils.discovery_utils as d_utils
 import common.config as config
 
 
@@ -65,6 +66,8 @@ class MySQLConfigurator(inst.PluginInstaller):
             default_socket_path = '/var/run/mysqld/mysqld.sock'
         if self.os == config.REDHAT:
             default_socket_path = '/var/lib/mysql/mysql.sock'
+        # sockets of the running mysqld processes
+        found = d_utils.discover_mysql(self.processes, self.listeners)
 
         while utils.ask('Would you like to add a DB server to monitor?'):
             remote = utils.ask(
@@ -91,10 +94,15 @@ class MySQLConfigurator(inst.PluginInstaller):
                         'between (0, 65535) inclusive.\n'))
             else:
                 socket = None
+                taken = [data[name].get('socket') for name in data]
+                sockets = [
+                    instance['socket'] for instance in found
+                    if instance.get('socket') not in [None] + taken]
+                def_socket = sockets[0] if sockets else default_socket_path
                 while(not self.check_socket_path(socket)):
                     socket = utils.get_input(
                         'What is the path to your mysql sock file?',
-                        default_socket_path)
+                        def_socket)
 
             if (host, port) in server_list:
                 utils.cprint(
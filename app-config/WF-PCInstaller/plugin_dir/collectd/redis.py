@@ -2,7 +2,9 @@
 Tested with redis-server 2.8.4 (Ubuntu 14.04)
 """
 import common.install_utils as utils
+import common.endpoint_check as endpoint_check
 import plugin_dir.plugin_installer as inst
+import plugin_dir.utils.discovery_utils as d_utils
 import common.config as config
 
 
@@ -87,9 +89,15 @@ class RedisConfigurator(inst.PluginInstaller):
             instance_name: {
                 host: value,
                 port: value,
+              or
+                master_name: value,
+                sentinels: [host:port, ...],
             (optional)
                 auth: value,
-                slave: bool
+                socket: value,
+                slave: bool,
+                latency: bool,
+                slowlog: bool
             }
         }
         """
@@ -97,6 +105,36 @@ class RedisConfigurator(inst.PluginInstaller):
         iname_list = []
         server_list = []
 
+        # instances found from the running redis-server processes
+        found = self.confirm_discovered(
+            d_utils.discover_redis(self.processes, self.listeners),
+            d_utils.describe, kind='redis')
+        if found:
+            latency = utils.ask(
+                'Would you like to collect latency events from them?\n'
+                '(LATENCY LATEST, the servers need '
+                'latency-monitor-threshold set)', default='no')
+            slowlog = utils.ask(
+                'Would you like to collect their slow log metrics?',
+                default='no')
+            use_socket = any('socket' in instance for instance in found)
+            if use_socket:
+                use_socket = utils.ask(
+                    'Some of them also listen on a unix socket.\n'
+                    'Would you like to connect through the sockets '
+                    'instead of TCP?')
+        for instance in found:
+            iname = d_utils.instance_name('redis', instance, iname_list)
+            iname_list.append(iname)
+            server_list.append((instance['host'], instance['port']))
+            data[iname] = dict(instance)
+            if not use_socket:
+                data[iname].pop('socket', None)
+            if latency:
+                data[iname]['latency'] = True
+            if slowlog:
+                data[iname]['slowlog'] = True
+
         while utils.ask('Would you like to add a server to monitor?'):
             iname = utils.prompt_and_check_input(
                 prompt=(
@@ -109,49 +147,114 @@ class RedisConfigurator(inst.PluginInstaller):
                     '{} has already been used.'.format),
                 usage_fmt=True).replace(" ", "")
 
-            host = utils.prompt_and_check_input(
-                prompt=(
-                    '\nPlease enter the hostname that connects to your\n'
-                    'redis server: (ex: localhost)'),
-                check_func=utils.hostname_resolves,
-                usage='{} does not resolve.'.format,
-                usage_fmt=True)
-
-            port = utils.prompt_and_check_input(
-                prompt=(
-                    '\nWhat is the TCP-port used to connect to the host? '),
-                check_func=utils.check_valid_port,
-                usage=(
-                    'A valid port is a number '
-                    'between (0, 65535) inclusive.'),
-                default='6379')
-
-            if (host, port) in server_list:
+            sentinel = utils.ask(
+                'Does Redis Sentinel manage the failover of this server?\n'
+                '(the plugin then follows the current master and its '
+                'replicas)', default='no')
+            if sentinel:
+                master_name = utils.get_input(
+                    '\nWhat is the master name Sentinel monitors? '
+                    '(ex: mymaster)')
+                sentinels = utils.prompt_and_check_input(
+                    prompt=(
+                        '\nPlease enter the Sentinel addresses, separated '
+                        'by spaces:\n(ex: 10.0.0.1:26379 10.0.0.2:26379)'),
+                    check_func=self.check_sentinels,
+                    usage=(
+                        'Addresses look like host:port, '
+                        'and each host must resolve.')).split()
+                host, port = None, None
+                target = 'master {}'.format(master_name)
+                server = ('sentinel', master_name)
+            else:
+                def_host, def_port = self.suggest_address(
+                    def_port='6379', taken=server_list)
+                host = utils.prompt_and_check_input(
+                    prompt=(
+                        '\nPlease enter the hostname that connects to your\n'
+                        'redis server: (ex: localhost)'),
+                    check_func=utils.hostname_resolves,
+                    usage='{} does not resolve.'.format,
+                    usage_fmt=True,
+                    default=def_host)
+
+                port = utils.prompt_and_check_input(
+                    prompt=(
+                        '\nWhat is the TCP-port used to connect to the host? '),
+                    check_func=utils.check_valid_port,
+                    usage=(
+                        'A valid port is a number '
+                        'between (0, 65535) inclusive.'),
+                    default=def_port)
+                target = '{host}:{port}'.format(host=host, port=port)
+                server = (host, port)
+
+            if server in server_list:
                 utils.eprint(
-                    'You have already monitored {host}:{port}.'.format(
-                        host=host, port=port))
+                    'You have already monitored {}.'.format(target))
                 continue
 
-            plugin_instance = (
-                '    Instance "{iname}"\n'
-                '    Host "{host}"\n'
-                '    Port "{port}"\n').format(
-                    iname=iname,
-                    host=host, port=port)
+            if sentinel:
+                plugin_instance = (
+                    '    Instance "{iname}"\n'
+                    '    MasterName "{name}"\n'
+                    '    Sentinel {addresses}\n').format(
+                        iname=iname, name=master_name,
+                        addresses=' '.join(
+                            '"{}"'.format(s) for s in sentinels))
+            else:
+                plugin_instance = (
+                    '    Instance "{iname}"\n'
+                    '    Host "{host}"\n'
+                    '    Port "{port}"\n').format(
+                        iname=iname,
+                        host=host, port=port)
 
             protected = utils.ask(
                     'Is there an authorization password set up for\n'
-                    '{host}:{port}'.format(host=host, port=port),
+                    '{}'.format(target),
                     default=None)
             if protected:
                 auth = utils.get_input(
                     'What is the authorization password?')
                 plugin_instance += (
                     '    Auth "{auth}"\n'.format(auth=auth))
-
-            slave = utils.ask(
+            else:
+                auth = None
+
+            unix_socket = None
+            if not sentinel:
+                unix_socket = self.get_unix_socket(host, port, auth)
+            if unix_socket is not None:
+                use_socket = utils.ask(
+                    '{host}:{port} also listens on the unix socket {sock}.\n'
+                    'Would you like to connect through the socket '
+                    'instead of TCP?'.format(
+                        host=host, port=port, sock=unix_socket))
+                if use_socket:
+                    plugin_instance += (
+                        '    Socket "{sock}"\n'.format(sock=unix_socket))
+                else:
+                    unix_socket = None
+
+            # Sentinel modules pick the metrics of each node's role
+            slave = not sentinel and utils.ask(
                 'Is this a slave server?', default='no')
 
+            # optional metric groups
+            latency = utils.ask(
+                'Would you like to collect latency events?\n'
+                '(LATENCY LATEST, the server needs '
+                'latency-monitor-threshold set)', default='no')
+            if latency:
+                plugin_instance += '    Latency true\n'
+            slowlog = utils.ask(
+                'Would you like to collect slow log metrics?\n'
+                '(SLOWLOG LEN and the entries added every interval)',
+                default='no')
+            if slowlog:
+                plugin_instance += '    Slowlog true\n'
+
             utils.cprint()
             if slave:
                 utils.cprint('(slave server)')
@@ -161,15 +264,27 @@ class RedisConfigurator(inst.PluginInstaller):
             if res:
                 utils.print_step('Saving instance')
                 iname_list.append(iname)
-                server_list.append((host, port))
-                data[iname] = {
-                    'host': host,
-                    'port': port,
-                }
+                server_list.append(server)
+                if sentinel:
+                    data[iname] = {
+                        'master_name': master_name,
+                        'sentinels': sentinels,
+                    }
+                else:
+                    data[iname] = {
+                        'host': host,
+                        'port': port,
+                    }
                 if protected:
                     data[iname]['auth'] = auth
+                if unix_socket is not None:
+                    data[iname]['socket'] = unix_socket
                 if slave:
                     data[iname]['slave'] = True
+                if latency:
+                    data[iname]['latency'] = True
+                if slowlog:
+                    data[iname]['slowlog'] = True
                 utils.print_success()
             else:
                 utils.cprint('This instance is not saved.')
@@ -218,7 +333,7 @@ class RedisConfigurator(inst.PluginInstaller):
             '    Redis_master_repl_offset "gauge"\n')
 
         slave_metrics = (
-            '    #Slave-Only'
+            '    #Slave-Only\n'
             '    Redis_master_last_io_seconds_ago "gauge"\n'
             '    Redis_slave_repl_offset "gauge"\n')
 
@@ -238,17 +353,36 @@ class RedisConfigurator(inst.PluginInstaller):
                 path=config.COLLECTD_PYTHON_PLUGIN_PATH))
 
         for instance in data:
-            plugin_instance = (
-                '    Instance "{iname}"\n'
-                '    Host "{host}"\n'
-                '    Port "{port}"\n').format(
-                    iname=instance,
-                    host=data[instance]['host'],
-                    port=data[instance]['port'])
+            if 'sentinels' in data[instance]:
+                plugin_instance = (
+                    '    Instance "{iname}"\n'
+                    '    MasterName "{name}"\n'
+                    '    Sentinel {addresses}\n').format(
+                        iname=instance,
+                        name=data[instance]['master_name'],
+                        addresses=' '.join(
+                            '"{}"'.format(s)
+                            for s in data[instance]['sentinels']))
+            else:
+                plugin_instance = (
+                    '    Instance "{iname}"\n'
+                    '    Host "{host}"\n'
+                    '    Port "{port}"\n').format(
+                        iname=instance,
+                        host=data[instance]['host'],
+                        port=data[instance]['port'])
             if 'auth' in data[instance]:
                 plugin_instance += (
                     '    Auth "{auth}"\n'.format(
                         auth=data[instance]['auth']))
+            if 'socket' in data[instance]:
+                plugin_instance += (
+                    '    Socket "{sock}"\n'.format(
+                        sock=data[instance]['socket']))
+            if 'latency' in data[instance]:
+                plugin_instance += '    Latency true\n'
+            if 'slowlog' in data[instance]:
+                plugin_instance += '    Slowlog true\n'
 
             out.write(
                 '\n  <Module redis_info>\n'
@@ -256,13 +390,48 @@ class RedisConfigurator(inst.PluginInstaller):
                 '{metrics}'.format(
                     plugin_instance=plugin_instance,
                     metrics=metrics))
-            if 'slave' in data[instance]:
+            # the plugin drops the keys a Sentinel node's role lacks
+            if 'slave' in data[instance] or 'sentinels' in data[instance]:
                 out.write(slave_metrics)
             out.write('  </Module>\n')
 
         out.write('</Plugin>\n')
         return True
 
+    def check_sentinels(self, addresses):
+        """
+        Input:
+            addresses string:
+                space separated host:port Sentinel addresses
+        Output:
+            True if there is at least one and all of them are valid
+            False otherwise
+        """
+        addresses = [
+            address.rpartition(':') for address in addresses.split()]
+        if not addresses:
+            return False
+        for host, sep, port in addresses:
+            if not sep or not host or not utils.check_valid_port(port):
+                return False
+        # all hosts at once, a slow resolver is waited on only once
+        resolved = utils.resolve_hosts(host for host, _, _ in addresses)
+        return all(resolved.values())
+
+    def get_unix_socket(self, host, port, auth=None):
+        """
+        Ask the running server for its unixsocket setting
+
+        Output:
+            the socket path if the server listens on one that
+            exists on this machine, None otherwise
+        """
+        unix_socket = endpoint_check.redis_config_get(
+            {'host': host, 'port': port, 'auth': auth}, 'unixsocket')
+        if not unix_socket or not utils.check_path_exists(unix_socket):
+            return None
+        return unix_socket
+
     def pull_comment(self, out):
         if config.DEBUG:
             filepath = '{conf_dir}/{conf_name}'.format(
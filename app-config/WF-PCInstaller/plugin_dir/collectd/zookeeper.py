@@ -4,6 +4,7 @@ Tested with zookeeper 3.4.8 (Ubuntu 14.04)
 import common.install_utils as utils
 import plugin_dir.plugin_installer as inst
 import plugin_dir.utils.plugin_utils as p_utils
+import plugin_dir.utils.discovery_utils as d_utils
 import common.config as config
 
 
@@ -38,9 +39,15 @@ class ZookeeperConfigurator(inst.PluginInstaller):
         note: can only monitor one instance
         """
         data = {}
+        # the client port of a running server from its zoo.cfg
+        found = d_utils.discover_zookeeper(self.processes, self.listeners)
+        if found:
+            default = (found[0]['host'], found[0]['port'])
+        else:
+            default = self.suggest_address(def_port='2181')
         record = True
         while record:
-            (host, port) = p_utils.get_host_and_port(def_port='2181')
+            (host, port) = p_utils.get_host_and_port(*default)
             plugin_instance = (
                 '    Host "{host}"\n'
                 '    Port "{port}"\n').format(
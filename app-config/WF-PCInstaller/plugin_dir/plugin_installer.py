@@ -3,7 +3,12 @@ The main interface for the configuration installer
 """
 import common.install_utils as utils
 import common.config as config
+import common.install_log as install_log
+import common.process_utils as process_utils
+import common.endpoint_check as endpoint_check
+import common.http_probe as http_probe
 import plugin_dir.plugin_exception as ex
+import plugin_dir.utils.plugin_utils as p_utils
 
 
 class PluginInstaller(object):
@@ -20,11 +25,17 @@ class PluginInstaller(object):
         write_plugin():
             - write the actual plugin file
     """
-    def __init__(self, os, agent, plugin_name, conf_name):
+    def __init__(self, os, agent, plugin_name, conf_name,
+                 processes=None, listeners=None):
         self.os = os
         self.agent = agent
         self.plugin_name = plugin_name
         self.conf_name = conf_name
+        # []process_utils.Process and []process_utils.Listener,
+        # the detected app's processes and the sockets they listen
+        # on, used to find instances and suggest defaults
+        self.processes = processes or []
+        self.listeners = listeners or []
 
         if self.agent == config.COLLECTD:
             self.conf_dir = config.COLLECTD_CONF_DIR
@@ -103,6 +114,111 @@ class PluginInstaller(object):
         raise NotImplementedError('output_config method not implemented')
 
     # helper methods
+    def suggest_address(self, def_host='127.0.0.1', def_port=None, taken=(),
+                        found=()):
+        """
+        Input:
+            def_host string, def_port string:
+                the usual host and port of the app
+            taken [](host, port):
+                addresses the user has already added
+            found []{}:
+                instances from discovery_utils, tried first
+        Output:
+            (host, port) strings:
+                a TCP address the app was found listening on that is
+                not taken yet, the one on def_port first, or
+                (def_host, def_port) if there is none
+        """
+        for instance in found:
+            address = (instance['host'], instance['port'])
+            if address not in taken:
+                return address
+
+        listeners = sorted(
+            (listener for listener in self.listeners
+             if listener.port is not None),
+            key=lambda listener: (str(listener.port) != def_port,
+                                  listener.port))
+        for listener in listeners:
+            address = (
+                process_utils.connect_host(listener, def_host),
+                str(listener.port))
+            if address not in taken:
+                return address
+        return (def_host, def_port)
+
+    def confirm_discovered(self, instances, describe, kind=None):
+        """
+        Input:
+            instances []{}:
+                instances found by discovery_utils
+            describe func:
+                returns the one line summary of an instance
+            kind string:
+                how endpoint_check validates the instances before
+                asking, e.g. redis; None to not validate them
+        Output:
+            accepted []{}:
+                the instances the user chose to monitor, all of
+                the valid ones with a single answer or one by one
+        """
+        if not instances:
+            return []
+
+        utils.cprint()
+        utils.cprint(
+            'The following instances were found running '
+            'on this host:')
+        if kind is None:
+            for instance in instances:
+                utils.cprint('  {}'.format(describe(instance)))
+            valid = list(instances)
+        else:
+            checks = self.check_discovered(instances, kind, describe)
+            p_utils.print_checks(checks, describe)
+            valid = [check.endpoint for check in checks if check.handshake]
+
+        if len(valid) == len(instances):
+            question = 'Would you like to monitor all of them?'
+        else:
+            question = (
+                'Would you like to monitor the {} that passed '
+                'the checks?'.format(len(valid)))
+        if valid and utils.ask(question):
+            return valid
+        return [
+            instance for instance in instances
+            if utils.ask('Would you like to monitor {}?'.format(
+                describe(instance)), default='no')]
+
+    def check_discovered(self, instances, kind, describe):
+        """
+        Output:
+            checks []endpoint_check.Check:
+                the checks of instances, those that failed for want
+                of a password checked again with the one the user
+                gives, which is then kept in the instance's auth
+        """
+        checks = endpoint_check.check_endpoints(instances, kind)
+        retry = []
+        for i, check in enumerate(checks):
+            if not endpoint_check.needs_auth(check):
+                continue
+            if utils.ask(
+                    '{} requires a password ({}).\n'
+                    'Would you like to enter it?'.format(
+                        describe(check.endpoint), check.detail)):
+                check.endpoint['auth'] = utils.get_input(
+                    'What is the authorization password?')
+                retry.append(i)
+        if retry:
+            rechecks = endpoint_check.check_endpoints(
+                [instances[i] for i in retry], kind)
+            for i, check in zip(retry, rechecks):
+                checks[i] = check
+        return checks
+
     def raise_error(self, msg):
         raise ex.MissingDependencyError(msg)
 
@@ -202,16 +318,19 @@ class PluginInstaller(object):
     def install(self):
         class_name = self.__class__.__name__
         try:
-            self.title()
-            self.overview()
-            self.check_plugin()
-            self.check_dependency()
-            self.clean_plugin_write()
-        except KeyboardInterrupt as e:
+            with install_log.phase('install', class_name):
+                self.title()
+                self.overview()
+                with install_log.phase('check_plugin'):
+                    self.check_plugin()
+                with install_log.phase('check_dependency'):
+                    self.check_dependency()
+                with install_log.phase('write_plugin'):
+                    self.clean_plugin_write()
+        except KeyboardInterrupt:
             utils.eprint(
                 'Quitting {}.'.format(
                     class_name))
-            utils.append_to_log(e, config.INSTALL_LOG)
             return False
         except ex.MissingDependencyError as e:
             utils.eprint(
@@ -219,15 +338,16 @@ class PluginInstaller(object):
                 '{} requires the missing dependency '
                 'to continue the installation.'.format(
                     e, class_name))
-            utils.append_to_log(e, config.INSTALL_LOG)
             return False
         except Exception as e:
             utils.eprint(
                 'Error: {}\n'
                 '{} was not installed successfully.'.format(
                     e, class_name))
-            utils.append_to_log(e, config.INSTALL_LOG)
             return False
+        finally:
+            # the status pages checked are not needed past here
+            http_probe.close_connections()
 
         utils.print_color_msg('{} was installed successfully.'.format(
             class_name), utils.GREEN)
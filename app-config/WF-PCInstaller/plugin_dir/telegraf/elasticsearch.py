@@ -45,7 +45,8 @@ class ElasticsearchConfigurator(inst.PluginInstaller):
         server_list = []
 
         while utils.ask('\nWould you like to add a server to monitor?'):
-            (host, port) = p_utils.get_host_and_port(def_port='9200')
+            (host, port) = p_utils.get_host_and_port(
+                *self.suggest_address(def_port='9200', taken=server_list))
             if (host, port) in server_list:
                 utils.eprint(
                     'You have already added this {host}:{port}.'.format(
@@ -5,6 +5,7 @@ import common.install_utils as utils
 import common.config as config
 import plugin_dir.plugin_installer as inst
 import plugin_dir.utils.plugin_utils as p_utils
+import plugin_dir.utils.discovery_utils as d_utils
 import plugin_dir.telegraf.telegraf_utils as tf_utils
 
 
@@ -45,8 +46,17 @@ class MemcachedConfigurator(inst.PluginInstaller):
         }
         server_list = []
 
+        # instances found from the running memcached processes
+        found = self.confirm_discovered(
+            d_utils.discover_memcached(self.processes, self.listeners),
+            d_utils.describe, kind='memcached')
+        for instance in found:
+            server_list.append((instance['host'], instance['port']))
+            data['servers'].append('{host}:{port}'.format(**instance))
+
         while utils.ask('\nWould you like to add a server to monitor?'):
-            (host, port) = p_utils.get_host_and_port(def_port='11211')
+            (host, port) = p_utils.get_host_and_port(
+                *self.suggest_address(def_port='11211', taken=server_list))
             if (host, port) in server_list:
                 utils.eprint(
                     'You have already added this {host}:{port}.'.format(
@@ -5,6 +5,7 @@ import common.install_utils as utils
 import common.config as config
 import plugin_dir.plugin_installer as inst
 import plugin_dir.utils.plugin_utils as p_utils
+import plugin_dir.utils.discovery_utils as d_utils
 import plugin_dir.telegraf.telegraf_utils as tf_utils
 
 
@@ -51,15 +52,20 @@ class MySQLConfigurator(inst.PluginInstaller):
         """
         data = {'servers': []}
         db_list = []
+        # servers found from the running mysqld processes
+        found = d_utils.discover_mysql(self.processes, self.listeners)
 
         while utils.ask('\nWould you like to add a mysql server to monitor?'):
+            def_host, def_port = self.suggest_address(
+                def_port='3306', taken=db_list, found=found)
             host = utils.prompt_and_check_input(
                 prompt=(
                     '\nWhat is the hostname or IP of your DB server? '
                     '(ex: 127.0.0.1)'),
                 check_func=utils.hostname_resolves,
                 usage='{} does not resolve.'.format,
-                usage_fmt=True)
+                usage_fmt=True,
+                default=def_host)
 
             port = utils.prompt_and_check_input(
                 prompt=(
@@ -68,7 +74,7 @@ class MySQLConfigurator(inst.PluginInstaller):
                 usage=(
                     'A valid port is a number '
                     'between (0, 65535) inclusive.'),
-                default="3306")
+                default=def_port)
 
             if (host, port) in db_list:
                 utils.cprint(
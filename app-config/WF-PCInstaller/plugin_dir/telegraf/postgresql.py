@@ -3,6 +3,7 @@ Tested with postgresql 9.3 (Ubuntu 14.04)
 """
 import common.install_utils as utils
 import plugin_dir.plugin_installer as inst
+import plugin_dir.utils.discovery_utils as d_utils
 import common.config as config
 
 
@@ -71,6 +72,8 @@ class PostgresqlConfigurator(inst.PluginInstaller):
         data = {}
         name_list = []  # keep a list of db name to check for uniqueness
         db_list = []
+        # servers found from the running postmasters
+        found = d_utils.discover_postgresql(self.processes, self.listeners)
 
         while utils.ask('Would you like to add a database to monitor?'):
             db = utils.get_input(
@@ -88,13 +91,19 @@ class PostgresqlConfigurator(inst.PluginInstaller):
                     '{} has already been used.'.format),
                 usage_fmt=True).replace(" ", "")
 
+            # a server not yet monitored for this database
+            def_host, def_port = self.suggest_address(
+                def_port='5432', found=found,
+                taken=[(d_host, d_port) for d_db, d_host, d_port in db_list
+                       if d_db == db])
             host = utils.prompt_and_check_input(
                 prompt=(
                     'What is the hostname or IP of your DB server? '
                     '(ex: 127.0.0.1)'),
                 check_func=utils.hostname_resolves,
                 usage='{} does not resolve.'.format,
-                usage_fmt=True)
+                usage_fmt=True,
+                default=def_host)
 
             port = utils.prompt_and_check_input(
                 prompt=(
@@ -103,7 +112,8 @@ class PostgresqlConfigurator(inst.PluginInstaller):
                 check_func=utils.check_valid_port,
                 usage=(
                     'A valid port is a number '
-                    'between (0, 65535) inclusive.\n'))
+                    'between (0, 65535) inclusive.\n'),
+                default=def_port)
 
             if (db, host, port) in db_list:
                 utils.cprint(
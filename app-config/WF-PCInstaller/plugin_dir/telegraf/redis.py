@@ -5,6 +5,7 @@ import common.install_utils as utils
 import common.config as config
 import plugin_dir.plugin_installer as inst
 import plugin_dir.utils.plugin_utils as p_utils
+import plugin_dir.utils.discovery_utils as d_utils
 import plugin_dir.telegraf.telegraf_utils as tf_utils
 
 
@@ -51,8 +52,23 @@ class RedisConfigurator(inst.PluginInstaller):
         }
         server_list = []
 
+        # instances found from the running redis-server processes,
+        # telegraf connects over tcp only
+        found = d_utils.discover_redis(self.processes, self.listeners)
+        for instance in found:
+            instance.pop('socket', None)
+        for instance in self.confirm_discovered(
+                found, d_utils.describe, kind='redis'):
+            server_list.append((instance['host'], instance['port']))
+            if 'auth' in instance:
+                url = ':{auth}@{host}:{port}'.format(**instance)
+            else:
+                url = '{host}:{port}'.format(**instance)
+            data['servers'].append(url)
+
         while utils.ask('\nWould you like to add a server to monitor?'):
-            (host, port) = p_utils.get_host_and_port(def_port='6379')
+            (host, port) = p_utils.get_host_and_port(
+                *self.suggest_address(def_port='6379', taken=server_list))
             if (host, port) in server_list:
                 utils.eprint(
                     'You have already added this {host}:{port}.'.format(
@@ -4,6 +4,7 @@ Common functions for apache found between collectd and telegraf configurators
 import re
 
 import common.install_utils as utils
+import common.install_log as install_log
 import common.config as config
 import plugin_dir.utils.plugin_utils as p_utils
 
@@ -34,15 +35,11 @@ def overview():
 def check_dependency(os):
     """
     Apache checklist:
-    - check curl
     - mod_status
     - extended status
     """
 
     utils.print_step('Checking dependency')
-    if not utils.command_exists('curl'):
-        raise Exception('Curl is needed for this plugin.')
-
     # ubuntu check
     # Assumption:
     # -latest apache2 is installed and the installation
@@ -112,6 +109,8 @@ def check_dependency(os):
                 'extendedstatus.conf is now included in the '
                 '{0} dir.\n'.format(conf_dir))
             utils.print_step('Restarting apache')
+            # the restart output goes after the records so far
+            install_log.flush()
             ret = utils.call_command(
                 'service {app_name} restart >> '
                 '{log} 2>&1'.format(
@@ -142,11 +141,11 @@ def check_server_url(url, url_list=[]):
     """
     ret_val = False
 
-    if not p_utils.check_url(url, url_list):
+    res = p_utils.check_url(url, url_list)
+    if not res:
         return False
 
-    res = utils.get_command_output('curl -s {url}'.format(url=url))
-    status = check_apache_server_status(res)
+    status = check_apache_server_status(res.body)
     if status is None:
         utils.print_warn(
             'The url you have provided '
@@ -0,0 +1,444 @@
+"""
+Finds the running instances of a detected app from its processes'
+cmdline, the config files the cmdline points to (or the distro's
+default ones) and the sockets the processes listen on, so configurators can offer them for confirmation
+instead of prompting for each one.  Config files of containerized
+processes are read through /proc/<pid>/root, and a container's
+instances are reached at its own address.
+
+Each discover_* function takes the app's processes and listeners
+(see process_utils) and returns a list of instance dicts with host
+and port strings, plus the extra keys of the app's configurator data,
+sorted by port.  A listener beats the config files, which beat the
+app's built-in defaults.
+"""
+import glob
+import os
+
+import common.process_utils as process_utils
+
+DEFAULT_HOST = '127.0.0.1'
+# config files distro packages start redis-server with, tried in
+# order when the cmdline no longer shows one
+REDIS_DEFAULT_FILES = [
+    '/etc/redis/{port}.conf', '/etc/redis/redis.conf', '/etc/redis.conf']
+# config files mysqld reads when not given --defaults-file
+MYSQL_DEFAULT_FILES = ['/etc/my.cnf', '/etc/mysql/my.cnf']
+MYSQL_SECTIONS = ['mysqld', 'server', 'mariadb']
+
+
+def discover_redis(processes, listeners):
+    """
+    instance keys: host, port
+    (optional) auth, socket, slave
+    """
+    instances = []
+    for process in processes:
+        args = process.cmdline.split()
+        # sentinels are found through the master name instead
+        if 'sentinel' in process.cmdline or not args:
+            continue
+
+        options = {}
+        conf_files = [
+            arg for arg in args[1:2]
+            if not arg.startswith('-') and arg.endswith('.conf')]
+        for key in ('port', 'bind', 'unixsocket', 'requirepass',
+                    'slaveof', 'replicaof'):
+            value = get_option(args[1:], key)
+            if value is not None:
+                options[key] = value
+        # redis 3.0+ rewrites its cmdline to "redis-server host:port"
+        if len(args) > 1 and not conf_files:
+            host, _, port = args[1].rpartition(':')
+            if port.isdigit():
+                options.setdefault('port', port)
+                options.setdefault('bind', host)
+
+        if conf_files:
+            settings = read_redis_conf(
+                resolve_path(process.pid, conf_files[0]), process.pid)
+        else:
+            settings = read_default_redis_conf(
+                process.pid, options.get('port'))
+        # options on the cmdline override the file
+        settings.update(options)
+
+        port = settings.get('port', '6379')
+        if port == '0':
+            # tcp is disabled
+            continue
+        instance = tcp_instance(
+            process.pid, listeners, port, settings.get('bind'))
+        if 'requirepass' in settings:
+            instance['auth'] = settings['requirepass']
+        socket = unix_socket(
+            process.pid, listeners, settings.get('unixsocket'))
+        if socket is not None:
+            instance['socket'] = socket
+        if 'slaveof' in settings or 'replicaof' in settings:
+            instance['slave'] = True
+        instances.append(instance)
+    return unique_instances(instances)
+
+
+def discover_memcached(processes, listeners):
+    """
+    instance keys: host, port
+    """
+    instances = []
+    for process in processes:
+        args = process.cmdline.split()[1:]
+        if get_option(args, 'unix-socket', 's') is not None:
+            # memcached does not open tcp ports with a unix socket
+            continue
+        instances.append(tcp_instance(
+            process.pid, listeners,
+            get_option(args, 'port', 'p') or '11211',
+            get_option(args, 'listen', 'l')))
+    return unique_instances(instances)
+
+
+def discover_zookeeper(processes, listeners):
+    """
+    instance keys: host, port
+
+    zookeeper also listens on its quorum, election and jmx ports,
+    so the client port comes from zoo.cfg
+    """
+    instances = []
+    for process in processes:
+        cfg_files = [
+            arg for arg in process.cmdline.split()[1:]
+            if arg.endswith('.cfg')]
+        if not cfg_files:
+            continue
+        settings = read_properties(
+            resolve_path(process.pid, cfg_files[-1]))
+        port = settings.get('clientPort')
+        if port is None:
+            continue
+        host = settings.get('clientPortAddress')
+        instances.append({
+            'host': bind_host(host), 'port': port})
+    return unique_instances(instances)
+
+
+def discover_mysql(processes, listeners):
+    """
+    instance keys: host, port
+    (optional) socket
+    """
+    instances = []
+    for process in processes:
+        args = process.cmdline.split()[1:]
+        conf_file = get_option(args, 'defaults-file')
+        if conf_file is not None:
+            conf_files = [resolve_path(process.pid, conf_file)]
+        else:
+            conf_files = [
+                resolve_path(process.pid, path)
+                for path in MYSQL_DEFAULT_FILES]
+            extra_file = get_option(args, 'defaults-extra-file')
+            if extra_file is not None:
+                conf_files.append(resolve_path(process.pid, extra_file))
+        settings = read_my_cnf(conf_files, MYSQL_SECTIONS, process.pid)
+        for key in ('port', 'socket', 'bind-address'):
+            value = get_option(args, key)
+            if value is not None:
+                settings[key] = value
+
+        instance = tcp_instance(
+            process.pid, listeners, settings.get('port', '3306'),
+            settings.get('bind-address'))
+        socket = unix_socket(process.pid, listeners, settings.get('socket'))
+        if socket is not None:
+            instance['socket'] = socket
+        instances.append(instance)
+    return unique_instances(instances)
+
+
+def discover_postgresql(processes, listeners):
+    """
+    instance keys: host, port
+
+    Only the postmaster has -D or config_file on its cmdline,
+    the backends it forks are skipped.
+    """
+    instances = []
+    for process in processes:
+        args = process.cmdline.split()[1:]
+        options = dict(
+            arg.split('=', 1) for arg in get_options(args, None, 'c')
+            if '=' in arg)
+        conf_file = options.get('config_file') or get_option(
+            args, 'config-file')
+        data_dir = get_option(args, None, 'D')
+        if conf_file is None and data_dir is None:
+            continue
+        if conf_file is None:
+            conf_file = os.path.join(data_dir, 'postgresql.conf')
+        settings = read_properties(
+            resolve_path(process.pid, conf_file), inline_comments=True)
+        settings.update(options)
+        port = get_option(args, None, 'p') or settings.get('port', '5432')
+        instances.append(tcp_instance(
+            process.pid, listeners, port,
+            settings.get('listen_addresses', 'localhost')))
+    return unique_instances(instances)
+
+
+# instance helpers
+def tcp_instance(pid, listeners, port, bind=None):
+    """
+    Input:
+        port string:
+            the port found in the app's config or its default
+        bind string:
+            the comma or space separated addresses the app binds to
+    Output:
+        {host, port} of the socket the process listens on, the one
+        on port first, or of port and bind if it listens on none,
+        and the container id of a containerized process
+    """
+    tcp = [
+        listener for listener in listeners
+        if listener.pid == pid and listener.port is not None]
+    tcp.sort(key=lambda listener: str(listener.port) != port)
+    if not tcp:
+        return {'host': bind_host(bind), 'port': port}
+
+    instance = {
+        'host': process_utils.connect_host(tcp[0], DEFAULT_HOST),
+        'port': str(tcp[0].port)}
+    if tcp[0].container is not None:
+        instance['container'] = tcp[0].container
+    return instance
+
+
+def unix_socket(pid, listeners, path=None):
+    """
+    the path of the unix socket the process listens on,
+    path if it listens on none
+    """
+    for listener in listeners:
+        if listener.pid == pid and listener.family == 'unix':
+            return listener.address
+    return path
+
+
+def bind_host(bind):
+    """the host to connect to for the first address of a bind setting"""
+    if not bind:
+        return DEFAULT_HOST
+    host = bind.replace(',', ' ').split()[0]
+    if host in ('*', 'localhost') or host in process_utils.ANY_ADDRESSES:
+        return DEFAULT_HOST
+    return host
+
+
+def unique_instances(instances):
+    """drop repeated host and port pairs and sort by port"""
+    unique = {}
+    for instance in instances:
+        unique.setdefault((instance['host'], instance['port']), instance)
+    return sorted(
+        unique.values(),
+        key=lambda instance: (int(instance['port']), instance['host']))
+
+
+# cmdline helpers
+def get_options(args, long_name=None, short_name=None):
+    """
+    Output:
+        the values of every --long_name=value, --long_name value,
+        -s value and -svalue in args, '_' and '-' in long
+        names being the same
+    """
+    values = []
+    for i, arg in enumerate(args):
+        following = args[i + 1] if i + 1 < len(args) else None
+        if long_name is not None and arg.startswith('--'):
+            name, equals, value = arg[2:].partition('=')
+            if name.replace('_', '-') != long_name:
+                continue
+            if equals:
+                values.append(value)
+            elif following is not None and not following.startswith('-'):
+                values.append(following)
+        elif short_name is not None and arg.startswith('-' + short_name):
+            if len(arg) > len(short_name) + 1:
+                values.append(arg[len(short_name) + 1:])
+            elif following is not None:
+                values.append(following)
+    return values
+
+
+def get_option(args, long_name=None, short_name=None):
+    """the last value of an option, see get_options, None if not given"""
+    values = get_options(args, long_name, short_name)
+    if values:
+        return values[-1]
+    return None
+
+
+def resolve_path(pid, path):
+    """
+    Output:
+        path as the process sees it, relative to its working
+        directory and under its root directory, which is not
+        ours in a container
+    """
+    proc_path = os.path.join(process_utils.PROC_DIR, str(pid))
+    if not os.path.isabs(path):
+        try:
+            path = os.path.join(
+                os.readlink(os.path.join(proc_path, 'cwd')), path)
+        except (IOError, OSError):
+            return path
+    rooted = os.path.join(proc_path, 'root', path.lstrip('/'))
+    if os.path.exists(rooted):
+        return rooted
+    return path
+
+
+# config file helpers
+def read_lines(path):
+    """the lines of path that are not blank or comments"""
+    try:
+        with open(path) as conf_file:
+            lines = [line.strip() for line in conf_file]
+    except (IOError, OSError):
+        return []
+    return [line for line in lines if line and line[0] not in '#;']
+
+
+def unquote(value):
+    if len(value) > 1 and value[0] == value[-1] and value[0] in '"\'':
+        return value[1:-1]
+    return value
+
+
+def read_redis_conf(path, pid, depth=0):
+    """
+    Output:
+        settings {directive: value}:
+            the last value of each directive of a redis.conf,
+            following its include directives as process pid does
+    """
+    settings = {}
+    for line in read_lines(path):
+        directive, _, value = line.partition(' ')
+        directive = directive.lower()
+        value = unquote(value.strip())
+        if directive == 'include':
+            if depth < 5:
+                settings.update(read_redis_conf(
+                    resolve_path(pid, value), pid, depth + 1))
+        else:
+            settings[directive] = value
+    return settings
+
+
+def read_default_redis_conf(pid, port=None):
+    """
+    Output:
+        settings {directive: value}:
+            those of the first of REDIS_DEFAULT_FILES that sets
+            port (any file when port is None), {} if none does
+    """
+    for path in REDIS_DEFAULT_FILES:
+        path = resolve_path(pid, path.format(port=port or '6379'))
+        settings = read_redis_conf(path, pid)
+        if settings and (
+                port is None or settings.get('port', '6379') == port):
+            return settings
+    return {}
+
+
+def read_properties(path, inline_comments=False):
+    """
+    Output:
+        settings {key: value}:
+            the key=value lines of a java properties file like
+            zoo.cfg, or of postgresql.conf with inline_comments
+    """
+    settings = {}
+    for line in read_lines(path):
+        if inline_comments:
+            line = line.split('#', 1)[0]
+        key, equals, value = line.partition('=')
+        if not equals:
+            # postgresql.conf allows "key value"
+            key, _, value = line.partition(' ')
+        settings[key.strip()] = unquote(value.strip())
+    return settings
+
+
+def read_my_cnf(paths, sections, pid, depth=0):
+    """
+    Output:
+        settings {option: value}:
+            the options of the given sections of my.cnf files,
+            following !include and !includedir as process pid
+            does, later files winning
+    """
+    settings = {}
+    for path in paths:
+        section = None
+        for line in read_lines(path):
+            if line.startswith('!include'):
+                directive, _, target = line.partition(' ')
+                target = resolve_path(pid, target.strip())
+                if depth >= 5:
+                    continue
+                if directive == '!includedir':
+                    included = sorted(
+                        glob.glob(os.path.join(target, '*.cnf')))
+                else:
+                    included = [target]
+                settings.update(
+                    read_my_cnf(included, sections, pid, depth + 1))
+            elif line.startswith('['):
+                section = line.strip('[] ').lower()
+            elif section in sections:
+                option, _, value = line.partition('=')
+                option = option.strip().replace('_', '-')
+                settings[option] = unquote(value.strip())
+    return settings
+
+
+# configurator helpers
+def describe(instance):
+    """one line summary of an instance, like 127.0.0.1:6379 (slave)"""
+    notes = []
+    if 'container' in instance:
+        notes.append('container {}'.format(instance['container']))
+    if 'socket' in instance:
+        notes.append('socket {}'.format(instance['socket']))
+    if 'auth' in instance:
+        notes.append('password protected')
+    if instance.get('slave'):
+        notes.append('slave')
+    summary = '{host}:{port}'.format(**instance)
+    if notes:
+        summary += ' ({})'.format(', '.join(notes))
+    return summary
+
+
+def instance_name(app, instance, taken):
+    """
+    Output:
+        app_port, app_container_port for a container, or
+        app_host_port if the name is in taken, e.g. redis_6380
+    """
+    if 'container' in instance:
+        iname = '{}_{}_{}'.format(
+            app, instance['container'], instance['port'])
+    else:
+        iname = '{}_{}'.format(app, instance['port'])
+    if iname in taken:
+        iname = '{}_{}_{}'.format(
+            app, instance['host'].replace('.', '_').replace(':', '_'),
+            instance['port'])
+    return iname
@@ -61,11 +61,11 @@ def check_server_url(url, url_list=[]):
     """
     ret_val = False
 
-    if not p_utils.check_url(url, url_list):
+    res = p_utils.check_url(url, url_list)
+    if not res:
         return False
 
-    res = utils.get_command_output('curl -s {url}'.format(url=url))
-    status = check_nginx_status(res)
+    status = check_nginx_status(res.body)
     if not status:
         utils.print_warn(
             'The url you have provided '
@@ -3,6 +3,7 @@
 factored out.
 - unlike install_utils, this file contains prompts and error messages.
 """
+import common.http_probe as http_probe
 import common.install_utils as utils
 import json
 
@@ -16,7 +17,8 @@ def check_url(url, url_list=[]):
         url string: the url provided by the user
         url_list []string: list of url user has monitored already
     Output:
-        True if the user provides a valid url
+        the http_probe.Response of the url if the user
+        provides a valid url
         False otherwise
     """
     if url is None:
@@ -34,10 +36,7 @@ def check_url(url, url_list=[]):
             'You have already added this {}'.format(url))
         return False
 
-    if not check_http_response(url):
-        return False
-
-    return True
+    return check_http_response(url) or False
 
 
 def check_http_response(url):
@@ -47,13 +46,14 @@ def check_http_response(url):
     Input:
         url string: the url provided by the user
     Output:
-        ret_val bool:
-            True if the url is valid and returns 200 OK
-            False otherwise
+        ret_val http_probe.Response:
+            the response if the url is valid and returns 200 OK,
+            after redirects
+            None otherwise
     """
-    ret_val = False
+    ret_val = None
     utils.print_step('Checking http response for {url}'.format(url=url))
-    res = utils.get_command_output('curl -s --head {url}'.format(url=url))
+    res = http_probe.probe(url)
 
     if res is None:
         ret_code = utils.INVALID_URL
@@ -73,7 +73,7 @@ def check_http_response(url):
             'again.\n')
     elif ret_code == utils.HTTP_OK:
         utils.print_success()
-        ret_val = True
+        ret_val = res
 
     return ret_val
 
@@ -146,6 +146,34 @@ def get_host_and_port(def_host='127.0.0.1', def_port=None):
     return (host, port)
 
 
+def print_checks(checks, describe):
+    """
+    print endpoint checks as a table, a row per endpoint
+
+    Input:
+        checks []endpoint_check.Check:
+            the results of endpoint_check.check_endpoints
+        describe func:
+            returns the one line summary of an endpoint
+    """
+    marks = {True: 'ok', False: 'FAIL', None: '-'}
+    names = [describe(check.endpoint) for check in checks]
+    name_pad = max([len('Instance')] + [len(name) for name in names])
+    rowf = '{name:{name_pad}}  {dns:5} {tcp:5} {handshake:10} {detail}'
+
+    utils.cprint(rowf.format(
+        name='Instance', name_pad=name_pad, dns='DNS', tcp='TCP',
+        handshake='Handshake', detail=''))
+    for name, check in zip(names, checks):
+        utils.print_color_msg(
+            rowf.format(
+                name=name, name_pad=name_pad,
+                dns=marks[check.dns], tcp=marks[check.tcp],
+                handshake=marks[check.handshake],
+                detail=check.detail or ''),
+            utils.GREEN if check.handshake else utils.RED)
+
+
 # other helpers
 def json_dumps(obj):
     """
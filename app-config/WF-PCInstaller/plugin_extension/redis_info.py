@@ -30,99 +30,1168 @@
 #   http://collectd.org/documentation/manpages/collectd-python.5.shtml
 
 import collectd
+import collections
+import select
 import socket
 import re
+import threading
+import time
+# python 2/3 compatibility
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 # Verbose logging on/off. Override in config by specifying 'Verbose'.
 VERBOSE_LOGGING = False
 
 CONFIGS = []
-REDIS_INFO = {}
 
+# Info keys dispatched under a shorter type_instance, keyed by (key, type)
+TYPE_INSTANCE_RENAMES = {
+    ('total_connections_received', 'counter'): 'connections_received',
+    ('total_commands_processed', 'counter'): 'commands_processed',
+}
+# INFO section of every key the configurator offers, plus patterns for the
+# numbered and prefixed families. Keys not listed here make the plugin fall
+# back to requesting the full INFO.
+INFO_SECTION_KEYS = {
+    'redis_version': 'server', 'uptime_in_seconds': 'server',
+    'uptime_in_days': 'server', 'lru_clock': 'server', 'hz': 'server',
+    'connected_clients': 'clients', 'blocked_clients': 'clients',
+    'client_longest_output_list': 'clients',
+    'client_biggest_input_buf': 'clients',
+    'mem_fragmentation_ratio': 'memory', 'maxmemory': 'memory',
+    'changes_since_last_save': 'persistence', 'loading': 'persistence',
+    'total_connections_received': 'stats',
+    'total_commands_processed': 'stats',
+    'instantaneous_ops_per_sec': 'stats',
+    'total_net_input_bytes': 'stats', 'total_net_output_bytes': 'stats',
+    'instantaneous_input_kbps': 'stats', 'instantaneous_output_kbps': 'stats',
+    'rejected_connections': 'stats', 'expired_keys': 'stats',
+    'evicted_keys': 'stats', 'keyspace_hits': 'stats',
+    'keyspace_misses': 'stats', 'pubsub_channels': 'stats',
+    'pubsub_patterns': 'stats', 'latest_fork_usec': 'stats',
+    'sync_full': 'stats', 'sync_partial_ok': 'stats',
+    'sync_partial_err': 'stats',
+    'role': 'replication', 'connected_slaves': 'replication',
+}
+INFO_SECTION_PATTERNS = [
+    (re.compile(r'used_memory'), 'memory'),
+    (re.compile(r'(rdb|aof)_'), 'persistence'),
+    (re.compile(r'(master|slave|repl)_'), 'replication'),
+    (re.compile(r'slave\d+_'), 'replication'),
+    (re.compile(r'used_cpu_'), 'cpu'),
+    (re.compile(r'cmdstat_'), 'commandstats'),
+    (re.compile(r'db\d+_'), 'keyspace'),
+]
 
-def fetch_info(conf):
-    """Connect to Redis server and request info"""
-    try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((conf['host'], conf['port']))
-        log_verbose('Connected to Redis at %s:%s' % (conf['host'], conf['port']))
-    except socket.error, e:
-        collectd.error('redis_info plugin: Error connecting to %s:%d - %r'
-                       % (conf['host'], conf['port'], e))
-        return None
+# Types whose data source is not a gauge, values keep their integer form
+INTEGER_TYPES = ('counter', 'derive', 'absolute')
 
-    fp = s.makefile('r')
+# Delay before retrying a failed connection, doubled on every consecutive
+# failure up to the max. Override in config with 'ReconnectBackoff' and
+# 'MaxReconnectBackoff' (seconds).
+RECONNECT_BACKOFF = 1.0
+MAX_RECONNECT_BACKOFF = 300.0
 
-    if conf['auth'] is not None:
-        log_verbose('Sending auth command')
-        s.sendall('auth %s\r\n' % (conf['auth']))
+# Seconds allowed to open a connection, to wait on any single send or
+# receive, and for a whole request including reconnects. Override per
+# instance with 'ConnectTimeout', 'ReadTimeout' and 'Timeout'.
+CONNECT_TIMEOUT = 2.0
+READ_TIMEOUT = 5.0
+TOTAL_TIMEOUT = 10.0
+
+# Number of instances polled at once. 1 polls serially on the collectd read
+# thread; more starts a pool of worker threads. Override with 'Workers'.
+# Unless overridden, cluster and Sentinel nodes are polled CLUSTER_WORKERS
+# at a time.
+WORKERS = None
+CLUSTER_WORKERS = 8
+# Seconds a read cycle waits for the worker pool before giving up on the
+# instances still in flight. Override with 'CycleDeadline'.
+CYCLE_DEADLINE = 10.0
+POOL = None
+
+# Seconds between CLUSTER NODES topology refreshes of a 'Cluster true'
+# module. Override with 'ClusterRefreshInterval'.
+CLUSTER_REFRESH_INTERVAL = 300.0
+# Node flags that mark a cluster node as unreachable
+CLUSTER_SKIP_FLAGS = ('fail', 'noaddr', 'handshake')
+
+# With 'Sentinel' addresses and a 'MasterName', the master and replicas
+# Sentinel reports for that name are polled, rediscovered every
+# 'SentinelRefreshInterval' seconds or as soon as the master stops
+# answering.
+SENTINEL_PORT = 26379
+SENTINEL_REFRESH_INTERVAL = 30.0
+# Flags that mark a replica Sentinel reports as unreachable
+SENTINEL_SKIP_FLAGS = ('s_down', 'o_down', 'disconnected')
+# Error a Sentinel older than Redis 5.0 replies to SENTINEL replicas with
+UNKNOWN_SUBCOMMAND_RE = re.compile(r'unknown (sentinel )?subcommand', re.I)
+
+# Info keys only one replication role reports. A node whose role is known
+# (cluster and Sentinel nodes) does not request the other role's keys, so
+# one module can list the metrics of both.
+ROLE_ONLY_PATTERNS = {
+    'master': re.compile(r'slave\d+_'),
+    'slave': re.compile(r'master_(last_io|link|sync)|'
+                        r'slave_(repl_offset|priority|read_only)'),
+}
+
+# With 'CommandStats true', per-command rates from INFO commandstats are
+# dispatched for the top 'CommandStatsTopN' commands ranked by
+# 'CommandStatsOrder' (calls or usec); the rest are summed as "other".
+COMMANDSTATS_TOP_N = 10
+COMMANDSTATS_ORDERS = ('calls', 'usec')
+
+# With 'SuppressUnchanged true', a gauge whose value did not change since
+# it was last sent is skipped, but still sent at least every
+# 'HeartbeatInterval' read cycles. Counters are always sent so collectd's
+# rate computation never sees gaps.
+HEARTBEAT_INTERVAL = 10
+
+# With 'Latency true', LATENCY LATEST (Redis 2.8.13+, with the server's
+# latency-monitor-threshold set) is sent along with INFO, and the spike of
+# each latency event seen since the last cycle and its all-time max are
+# reported. With 'Slowlog true', SLOWLOG LEN and the slow log entries
+# logged since the last cycle are read, up to 'SlowlogMaxEntries' a cycle.
+SLOWLOG_MAX_ENTRIES = 128
+
+# Every 'ConfigGet' parameter (e.g. maxmemory, maxclients) is read with
+# CONFIG GET and dispatched as config_<parameter> when numeric. With
+# 'ClientList true', CLIENT LIST is read and connections are counted by
+# kind, as blocked, and as idle for at least 'ClientIdleThreshold' seconds.
+CLIENT_IDLE_THRESHOLD = 300
+# CLIENT LIST flag of each connection kind, checked in this order
+CLIENT_KINDS = (('M', 'master'), ('S', 'slave'), ('O', 'monitor'),
+                ('P', 'pubsub'))
+
+# With 'KeyspaceSampling true', every cycle continues a SCAN of the
+# instance's keyspace and looks up MEMORY USAGE and TYPE of the keys it
+# returns, stopping after 'SampleKeys' keys or 'SampleTimeBudget'
+# milliseconds. Sizes are aggregated per key prefix (text before the first
+# 'SamplePrefixSeparator') for the 'SamplePrefixes' biggest prefixes and
+# the 'SampleTopK' largest keys are reported.
+SAMPLE_KEYS = 1000
+SAMPLE_TIME_BUDGET = 50.0
+SAMPLE_TOP_K = 10
+SAMPLE_PREFIXES = 20
+SAMPLE_PREFIX_SEPARATOR = ':'
+# keys asked of each SCAN call
+SAMPLE_SCAN_COUNT = 100
+# upper bounds (bytes) of the per prefix size histogram buckets
+SAMPLE_SIZE_BUCKETS = ((1024, 'le_1k'), (10240, 'le_10k'),
+                       (102400, 'le_100k'), (1048576, 'le_1m'))
+SAMPLE_SIZE_OVERFLOW = 'gt_1m'
+
+# plugin_instance of the plugin's own metrics: per instance timings and
+# error counts (type_instance "<instance>-<metric>") and per read cycle
+# totals (type_instance "cycle-<metric>")
+SELF_PLUGIN_INSTANCE = 'self'
+
+
+# python 2/3 compatibility: sockets carry bytes, the plugin works on str
+if bytes is str:
+    def to_bytes(s):
+        return s
+
+    def to_str(b):
+        return b
+else:
+    def to_bytes(s):
+        return s.encode('utf-8')
+
+    def to_str(b):
+        return b.decode('utf-8', 'replace')
+
+
+def encode_command(command):
+    """
+    Inline commands are plain strings. Commands with arguments that may
+    contain spaces or binary data (key names) are tuples, sent as RESP
+    arrays of bulk strings.
+    """
+    if not isinstance(command, tuple):
+        return to_bytes(command + '\r\n')
+    parts = [to_bytes('*%d\r\n' % len(command))]
+    for arg in command:
+        if not isinstance(arg, bytes):
+            arg = to_bytes(str(arg))
+        parts.append(to_bytes('$%d\r\n' % len(arg)))
+        parts.append(arg + b'\r\n')
+    return b''.join(parts)
+
+
+class RedisError(Exception):
+    """Error reply (-ERR ...) or malformed reply from the server"""
+
+
+class BackoffError(Exception):
+    """Raised while a connection is waiting out its reconnect backoff"""
+
+
+class DeadlineError(socket.timeout):
+    """Raised when a request runs into the deadline its caller gave"""
+
+
+class RedisConnection(object):
+    """
+    Long-lived connection to one Redis server.
+
+    The socket is kept open across read cycles and AUTH is sent once per
+    socket, in the same write as the first request. A stale socket is
+    dropped and reopened transparently; failed connects and rejected
+    passwords are retried with exponential backoff.
+    """
+
+    def __init__(self, conf):
+        self.conf = conf
+        self.sock = None
+        self.fp = None
+        self.connected_once = False
+        self.consecutive_failures = 0
+        self.retry_at = 0
+        self.deadline = None
+        # whether the deadline, not the read timeout, limits socket calls
+        self.deadline_bound = False
+        # counters dispatched as plugin metrics
+        self.reconnects = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.last_error = None
+        # timings of the last request, see execute()
+        self.connect_time = None
+        self.io_time = 0.0
+        self.request_time = 0.0
+        self.bytes_received = 0
+
+    def address(self):
+        if self.conf['socket'] is not None:
+            return self.conf['socket']
+        return '%s:%s' % (self.conf['host'], self.conf['port'])
+
+    def connect(self):
+        """
+        Open the socket, or raise BackoffError. With a password set the
+        connection is only usable once send_and_read() has authenticated.
+        """
+        now = time.time()
+        if now < self.retry_at:
+            raise BackoffError('reconnect backoff for %.1fs more'
+                               % (self.retry_at - now))
+
+        try:
+            if self.conf['socket'] is not None:
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                address = self.conf['socket']
+            else:
+                self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                address = (self.conf['host'], self.conf['port'])
+            self.sock.settimeout(self.wait_time(self.conf['connect_timeout']))
+            self.sock.connect(address)
+            self.fp = self.sock.makefile('rb')
+        except socket.error:
+            self.connect_failed()
+            raise
+        finally:
+            self.connect_time = (self.connect_time or 0) + time.time() - now
+
+        if self.conf['auth'] is None:
+            self.connect_succeeded()
+
+    def connect_failed(self):
+        """Drop the socket and back off before the next connect"""
+        self.close()
+        self.consecutive_failures += 1
+        delay = min(self.conf['max_backoff'],
+                    self.conf['backoff'] *
+                    2 ** (self.consecutive_failures - 1))
+        self.retry_at = time.time() + delay
+
+    def connect_succeeded(self):
+        if self.connected_once:
+            self.reconnects += 1
+        self.connected_once = True
+        self.consecutive_failures = 0
+        self.retry_at = 0
+        log_verbose('Connected to Redis at %s' % self.address())
+
+    def close(self):
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def wait_time(self, limit):
+        """Seconds the next socket call may block, capped by the deadline"""
+        if self.deadline is None:
+            return limit
+        remaining = self.deadline - time.time()
+        self.deadline_bound = remaining < limit
+        if remaining <= 0:
+            raise socket.timeout('request deadline exceeded')
+        return min(limit, remaining)
+
+    def sendall(self, data):
+        self.sock.settimeout(self.wait_time(self.conf['read_timeout']))
+        start = time.time()
+        self.sock.sendall(data)
+        self.io_time += time.time() - start
+
+    def readline(self, limit=-1):
+        self.sock.settimeout(self.wait_time(self.conf['read_timeout']))
+        start = time.time()
+        line = self.fp.readline(limit)
+        self.io_time += time.time() - start
+        self.bytes_received += len(line)
+        return line
+
+    def read(self, size):
+        self.sock.settimeout(self.wait_time(self.conf['read_timeout']))
+        start = time.time()
+        data = self.fp.read(size)
+        self.io_time += time.time() - start
+        self.bytes_received += len(data)
+        return data
+
+    def is_healthy(self):
+        """
+        An idle pooled socket has nothing to read, so readability, or
+        bytes left in the read buffer, means the server closed it (or
+        sent data nobody asked for). poll is used where there is one,
+        select fails on descriptors past FD_SETSIZE.
+        """
+        try:
+            if hasattr(select, 'poll'):
+                poller = select.poll()
+                poller.register(self.sock, select.POLLIN)
+                readable = poller.poll(0)
+            else:
+                readable, _, _ = select.select([self.sock], [], [], 0)
+        except (select.error, ValueError):
+            return False
+        return not readable and not self.buffered()
+
+    def buffered(self):
+        """Whether fp holds bytes read off the socket but not consumed"""
+        if hasattr(self.fp, 'peek'):
+            # python 3, the socket has nothing to read so peek only
+            # looks at the buffer
+            self.sock.settimeout(0.0)
+            try:
+                return bool(self.fp.peek(1))
+            except (socket.error, ValueError):
+                return True
+        # python 2 socket._fileobject
+        rbuf = getattr(self.fp, '_rbuf', None)
+        return rbuf is not None and rbuf.tell() > 0
+
+    def read_reply(self):
+        """Read one status, error, integer, bulk or array reply"""
+        line = self.readline()
+        if not line.endswith(b'\r\n'):
+            raise socket.error('connection closed by server')
+        kind, payload = line[:1], to_str(line[1:-2])
+
+        if kind == b'+':
+            return payload
+        elif kind == b'-':
+            raise RedisError(payload)
+        elif kind == b':':
+            return int(payload)
+        elif kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self.read(length + 2)
+            if len(data) != length + 2:
+                raise socket.error('connection closed by server')
+            return to_str(data[:-2])
+        elif kind == b'*':
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self.read_reply() for _ in range(length)]
+        raise RedisError('Unexpected reply: %r' % line)
+
+    def read_bulk_lines(self):
+        """
+        Yield the lines of a bulk reply as they come off the socket, so
+        the payload is never held as one string.
+        """
+        line = self.readline()
+        if not line.endswith(b'\r\n'):
+            raise socket.error('connection closed by server')
+        if line[:1] == b'-':
+            raise RedisError(to_str(line[1:-2]))
+        if line[:1] != b'$':
+            raise RedisError('Unexpected reply: %r' % line)
+
+        # the payload is followed by a final CRLF
+        remaining = int(line[1:-2]) + 2
+        while remaining > 0:
+            line = self.readline(remaining)
+            if not line:
+                raise socket.error('connection closed by server')
+            remaining -= len(line)
+            yield to_str(line.rstrip(b'\r\n'))
+
+    def execute(self, commands, read, deadline=None):
+        """
+        Send inline commands in a single write and let read(conn) consume
+        the replies, all within the instance's total timeout, or by
+        deadline (a time.time()) if that comes first. A reused socket
+        that fails is reopened and the commands retried once. See
+        encode_command for the form of commands.
+
+        Afterwards connect_time (None if the socket was reused), io_time
+        (sending and waiting on replies), request_time and bytes_received
+        describe this request.
+        """
+        payload = b''.join(encode_command(command) for command in commands)
+        start = time.time()
+        self.deadline = start + self.conf['timeout']
+        if deadline is not None:
+            self.deadline = min(self.deadline, deadline)
+        self.deadline_bound = False
+        self.connect_time = None
+        self.io_time = 0.0
+        self.bytes_received = 0
+        try:
+            return self.execute_until_deadline(payload, read)
+        except RedisError:
+            raise
+        except Exception as e:
+            # a reply may be half read or still in flight (a timeout, a
+            # malformed reply, a failing read callback), the socket
+            # can't be reused
+            self.close()
+            if (isinstance(e, socket.timeout) and self.deadline_bound and
+                    self.deadline == deadline):
+                raise DeadlineError(str(e))
+            raise
+        finally:
+            self.deadline = None
+            self.request_time = time.time() - start
+
+    def last_request(self):
+        """(connect_time, io_time, request_time, bytes_received)"""
+        return (self.connect_time, self.io_time, self.request_time,
+                self.bytes_received)
+
+    def execute_until_deadline(self, payload, read):
+        fresh = False
+        if self.sock is not None and not self.is_healthy():
+            log_verbose('Dropping stale connection to %s' % self.address())
+            self.close()
+        if self.sock is None:
+            self.connect()
+            fresh = True
+
+        try:
+            return self.send_and_read(payload, read, fresh)
+        except socket.timeout:
+            raise
+        except socket.error:
+            self.close()
+            if fresh:
+                raise
 
-        status_line = fp.readline()
-        if not status_line.startswith('+OK'):
+        self.connect()
+        return self.send_and_read(payload, read, True)
+
+    def send_and_read(self, payload, read, fresh):
+        """
+        Write the payload in one send and let read(conn) consume the
+        replies. On a fresh socket with a password set, AUTH goes out
+        in the same send and its reply is checked first, so connecting
+        costs no extra round trip.
+        """
+        if not fresh or self.conf['auth'] is None:
+            self.sendall(payload)
+            return read(self)
+
+        log_verbose('Sending auth command')
+        try:
+            self.sendall(encode_command(('AUTH', self.conf['auth'])) +
+                         payload)
             # -ERR invalid password
             # -ERR Client sent AUTH, but no password is set
-            collectd.error('redis_info plugin: Error sending auth to %s:%d - %r'
-                           % (conf['host'], conf['port'], status_line))
-            return None
+            self.read_reply()
+        except (socket.error, RedisError):
+            # the replies to payload would only be NOAUTH errors
+            self.connect_failed()
+            raise
+        self.connect_succeeded()
+        return read(self)
 
-    log_verbose('Sending info command')
-    s.sendall('info\r\n')
 
-    status_line = fp.readline()
+def fetch_info(conf):
+    """
+    Request the needed info sections over the persistent connection,
+    followed by the extra commands of the enabled metric groups. The reply
+    to an extra command is stored in the info dict under its name; an
+    extra command the server rejects is dropped from later cycles.
+    """
+    extras = conf['extra_commands']
+    commands = conf['info_commands'] + [command for command, _ in extras]
+    rejected = []
 
-    if status_line.startswith('-'):
-        collectd.error('redis_info plugin: Error response from %s:%d - %r'
-                       % (conf['host'], conf['port'], status_line))
-        s.close()
-        return None
+    def read(conn):
+        info = {}
+        for command in conf['info_commands']:
+            lines = conn.read_bulk_lines()
+            if command == 'info commandstats' and conf['commandstats']:
+                lines = list(lines)
+                info['commandstats'] = parse_commandstats(lines)
+            parse_info(lines, conf['wanted'], conf['wanted_parents'], info)
+        # compatibility with pre-2.6 redis (used changes_since_last_save),
+        # once every section is in
+        if 'rdb_changes_since_last_save' in info:
+            info.setdefault('changes_since_last_save',
+                            info['rdb_changes_since_last_save'])
+        for command, name in extras:
+            # an error reply is a single line, the stream stays in step
+            try:
+                info[name] = conn.read_reply()
+            except RedisError as e:
+                rejected.append((command, e))
+        return info
+
+    info = request(conf['conn'], commands, read)
+    if rejected:
+        for command, e in rejected:
+            collectd.warning('redis_info plugin: %s rejected %s, no longer '
+                             'sending it - %s'
+                             % (conf['conn'].address(), command, e))
+        failed = [command for command, _ in rejected]
+        conf['extra_commands'] = [
+            extra for extra in extras if extra[0] not in failed]
+    if info is not None and VERBOSE_LOGGING:
+        log_verbose('Received %d info keys' % len(info))
+    return info
 
-    content_length = int(status_line[1:-1]) # status_line looks like: $<content_length>
-    data = fp.read(content_length)
-    log_verbose('Received data: %s' % data)
-    s.close()
 
-    linesep = '\r\n' if '\r\n' in data else '\n'
-    return parse_info(data.split(linesep))
+def request(conn, commands, read, deadline=None):
+    """
+    Run conn.execute(commands, read, deadline), logging and counting any
+    failure. Returns None if the request did not complete, the exception
+    is then left in conn.last_error. Running out of the caller's own
+    deadline is not counted as a timeout.
+    """
+    if VERBOSE_LOGGING:
+        log_verbose('Sending %s' % ', '.join(
+            ' '.join(str(arg) for arg in command)
+            if isinstance(command, tuple) else command
+            for command in commands))
+    try:
+        conn.last_error = None
+        return conn.execute(commands, read, deadline)
+    except BackoffError as e:
+        conn.last_error = e
+        log_verbose('Skipping %s - %s' % (conn.address(), e))
+        return None
+    except DeadlineError as e:
+        conn.last_error = e
+        log_verbose('Out of time talking to %s' % conn.address())
+        return None
+    except socket.timeout as e:
+        conn.last_error = e
+        conn.timeouts += 1
+        collectd.warning('redis_info plugin: Timed out talking to %s - %s, '
+                         'skipping this cycle' % (conn.address(), e))
+        return None
+    except socket.error as e:
+        conn.last_error = e
+        conn.failures += 1
+        collectd.error('redis_info plugin: Error talking to %s - %r'
+                       % (conn.address(), e))
+        return None
+    except RedisError as e:
+        # protocol state is unknown after an error reply, start over
+        conn.last_error = e
+        conn.close()
+        conn.failures += 1
+        collectd.error('redis_info plugin: Error response from %s - %r'
+                       % (conn.address(), e))
+        return None
+
 
+def parse_info(info_lines, wanted=None, wanted_parents=(), info=None):
+    """
+    Parse info response from Redis in one pass.
 
-def parse_info(info_lines):
-    """Parse info response from Redis"""
-    info = {}
+    If wanted is given only those keys are kept; multi-value lines are
+    split only when their name is in wanted_parents.
+    """
+    if info is None:
+        info = {}
     for line in info_lines:
         if "" == line or line.startswith('#'):
             continue
 
-        if ':' not in line:
+        key, sep, val = line.partition(':')
+        if not sep:
             collectd.warning('redis_info plugin: Bad format for info line: %s'
                              % line)
             continue
 
-        key, val = line.split(':')
+        if wanted is None or key in wanted:
+            if wanted is not None or ',' not in val:
+                info[key] = val
+                continue
+        elif key not in wanted_parents or '=' not in val:
+            continue
 
         # Handle multi-value keys (for dbs and slaves).
         # db lines look like "db0:keys=10,expire=0"
         # slave lines look like "slave0:ip=192.168.0.181,port=6379,state=online,offset=1650991674247,lag=1"
-        if ',' in val:
-            split_val = val.split(',')
-            for sub_val in split_val:
-                k, _, v = sub_val.rpartition('=')
-                sub_key = "{0}_{1}".format(key, k)
+        for sub_val in val.split(','):
+            k, _, v = sub_val.rpartition('=')
+            sub_key = "{0}_{1}".format(key, k)
+            if wanted is None or sub_key in wanted:
                 info[sub_key] = v
+
+    return info
+
+
+def parse_commandstats(lines):
+    """
+    Parse INFO commandstats into {command: (calls, usec)}.
+    Lines look like "cmdstat_get:calls=21,usec=175,usec_per_call=8.33"
+    """
+    stats = {}
+    for line in lines:
+        if not line.startswith('cmdstat_'):
+            continue
+        name, _, fields = line.partition(':')
+        calls = usec = 0
+        for field in fields.split(','):
+            k, _, v = field.partition('=')
+            if k == 'calls':
+                calls = int(v)
+            elif k == 'usec':
+                usec = int(v)
+        stats[name[len('cmdstat_'):]] = (calls, usec)
+    return stats
+
+
+def info_section(key):
+    """Name of the INFO section that reports key, or None if unknown"""
+    if key in INFO_SECTION_KEYS:
+        return INFO_SECTION_KEYS[key]
+    for pattern, section in INFO_SECTION_PATTERNS:
+        if pattern.match(key):
+            return section
+    return None
+
+
+def compile_info_request(plan, commandstats=False):
+    """
+    Work out the info commands and the key filter for a dispatch plan.
+
+    Each section gets its own command since Redis before 7.0 accepts a
+    single section per INFO. An unknown key falls back to a bare INFO.
+    """
+    commands = []
+    wanted = set()
+    wanted_parents = set()
+    for key, _, _, _, _ in plan:
+        wanted.add(key)
+        parts = key.split('_')
+        for i in range(1, len(parts)):
+            wanted_parents.add('_'.join(parts[:i]))
+
+        section = info_section(key)
+        if section is None:
+            commands = None
+        elif commands is not None and 'info ' + section not in commands:
+            commands.append('info ' + section)
+
+    if 'changes_since_last_save' in wanted:
+        wanted.add('rdb_changes_since_last_save')
+
+    if commands is None:
+        commands = ['info']
+    elif not commands and not commandstats:
+        commands = ['info server']
+    # a bare INFO does not include commandstats
+    if commandstats and 'info commandstats' not in commands:
+        commands.append('info commandstats')
+    return commands, wanted, wanted_parents
+
+
+class KeyspaceSampler(object):
+    """
+    Incremental big-key finder for one instance.
+
+    Each cycle resumes the SCAN cursor where the last cycle stopped and
+    sizes the keys it returns, within a budget of keys and time. Sizes
+    are aggregated for the pass in progress; once a pass over the whole
+    keyspace completes, its aggregates are reported until the next one
+    completes.
+    """
+
+    def __init__(self, keys, time_budget, top_k, prefixes, separator):
+        self.keys = keys
+        self.time_budget = time_budget / 1000.0
+        self.top_k = top_k
+        self.prefixes = prefixes
+        self.separator = separator
+        self.cursor = '0'
+        self.current = self.new_pass()
+        self.completed = None
+        # seconds the last batch, and each of its keys, took to scan
+        # and size
+        self.batch_time = None
+        self.key_time = None
+
+    def new_pass(self):
+        # prefix -> [keys, bytes, bucket counts...], type -> [keys, bytes],
+        # and the top_k largest (bytes, key) pairs
+        return {'prefixes': {}, 'types': {}, 'largest': []}
+
+    def sample(self, conf):
+        """
+        Scan and size keys until the budget runs out. Batches are sized
+        to fit the time left at half the last batch's pace, and a request
+        still running at the end of the budget is cut short, which
+        costs the connection. Returns False if the server can't be
+        sampled.
+        """
+        conn = conf['conn']
+        end = time.time() + self.time_budget
+        remaining = self.keys
+
+        def read_scan(conn):
+            return conn.read_reply()
+
+        def read_sizes(conn):
+            return [conn.read_reply() for _ in range(2 * len(keys))]
+
+        while remaining > 0 and time.time() < end:
+            count = min(SAMPLE_SCAN_COUNT, remaining)
+            if self.key_time:
+                # with room for a batch twice as slow as the last one
+                left = end - time.time()
+                count = min(count, int(left / (2 * self.key_time)))
+                if count < 1 or left < 2 * self.batch_time:
+                    break
+            batch_start = time.time()
+            reply = request(conn, [('SCAN', self.cursor, 'COUNT', count)],
+                            read_scan, end)
+            if reply is None:
+                # a batch cut short by the budget is rescanned next cycle
+                return isinstance(conn.last_error, DeadlineError)
+            self.cursor, keys = reply[0], reply[1]
+
+            if keys:
+                commands = []
+                for key in keys:
+                    commands.append(('MEMORY', 'USAGE', key))
+                    commands.append(('TYPE', key))
+                sizes = request(conn, commands, read_sizes, end)
+                if sizes is None:
+                    if isinstance(conn.last_error, DeadlineError):
+                        return True
+                    if isinstance(conn.last_error, RedisError):
+                        # MEMORY USAGE needs Redis 4.0
+                        collectd.warning('redis_info plugin: Disabling '
+                                         'keyspace sampling for %s'
+                                         % conn.address())
+                        conf['sampler'] = None
+                    return False
+                for i, key in enumerate(keys):
+                    self.add(key, sizes[2 * i], sizes[2 * i + 1])
+                remaining -= len(keys)
+                self.batch_time = time.time() - batch_start
+                self.key_time = self.batch_time / len(keys)
+
+            if self.cursor == '0':
+                self.completed = self.current
+                self.current = self.new_pass()
+        return True
+
+    def add(self, key, size, type):
+        if size is None:
+            # expired or deleted between SCAN and MEMORY USAGE
+            return
+
+        prefix = key.split(self.separator, 1)[0] if self.separator in key \
+            else '_none'
+        stats = self.current['prefixes'].get(prefix)
+        if stats is None:
+            stats = [0, 0] + [0] * (len(SAMPLE_SIZE_BUCKETS) + 1)
+            self.current['prefixes'][prefix] = stats
+        stats[0] += 1
+        stats[1] += size
+        for i, (bound, _) in enumerate(SAMPLE_SIZE_BUCKETS):
+            if size <= bound:
+                stats[2 + i] += 1
+                break
         else:
-            info[key] = val
+            stats[-1] += 1
 
-    # compatibility with pre-2.6 redis (used changes_since_last_save)
-    info["changes_since_last_save"] = info.get("changes_since_last_save", info.get("rdb_changes_since_last_save"))
+        type_stats = self.current['types'].setdefault(type, [0, 0])
+        type_stats[0] += 1
+        type_stats[1] += size
+
+        largest = self.current['largest']
+        if len(largest) < self.top_k or size > largest[-1][0]:
+            largest.append((size, key))
+            largest.sort(reverse=True)
+            del largest[self.top_k:]
+
+    def dispatch(self, conf):
+        """Dispatch the aggregates, returns the number of values sent"""
+        stats = self.completed or self.current
+        template = conf['values']
+        dispatched = 0
+
+        def send(type, type_instance, value, meta=None):
+            if meta is None:
+                template.dispatch(type=type, type_instance=type_instance,
+                                  values=[value])
+            else:
+                template.dispatch(type=type, type_instance=type_instance,
+                                  values=[value], meta=meta)
+
+        prefixes = sorted(stats['prefixes'].items(),
+                          key=lambda item: item[1][1], reverse=True)
+        top = prefixes[:self.prefixes]
+        rest = [item[1] for item in prefixes[self.prefixes:]]
+        if rest:
+            top.append(('other', [sum(col) for col in zip(*rest)]))
+
+        labels = [label for _, label in SAMPLE_SIZE_BUCKETS]
+        labels.append(SAMPLE_SIZE_OVERFLOW)
+        for prefix, counts in top:
+            name = 'keyspace_prefix_%s_' % sanitize(prefix)
+            send('count', name + 'keys', counts[0])
+            send('bytes', name + 'bytes', counts[1])
+            for label, count in zip(labels, counts[2:]):
+                send('count', name + label, count)
+            dispatched += 2 + len(labels)
+
+        for type, (keys, size) in stats['types'].items():
+            send('count', 'keyspace_type_%s_keys' % sanitize(type), keys)
+            send('bytes', 'keyspace_type_%s_bytes' % sanitize(type), size)
+            dispatched += 2
+
+        base_tags = (template.meta or {}).get('tsdb_tags')
+        for rank, (size, key) in enumerate(stats['largest']):
+            tags = 'key=%s' % sanitize(key)
+            if base_tags:
+                tags = base_tags + ' ' + tags
+            send('bytes', 'keyspace_largest_%d' % (rank + 1), size,
+                 {'tsdb_tags': tags})
+            dispatched += 1
+
+        return dispatched
+
+
+def sanitize(name, limit=64):
+    """Make a key or prefix safe to use in a metric name or tag"""
+    return re.sub(r'[^A-Za-z0-9._-]', '_', name)[:limit]
 
-    return info
+
+def new_sampler(conf):
+    settings = conf['sampling']
+    if settings is None:
+        return None
+    return KeyspaceSampler(**settings)
+
+
+def compile_extra_commands(latency, slowlog, slowlog_max, config_params=(),
+                           client_list=False):
+    """(command, info name) pairs sent after INFO for the metric groups"""
+    extras = []
+    # CONFIG GET takes a single parameter before Redis 7.0
+    for param in config_params:
+        extras.append(('config get %s' % param, 'config_' + param))
+    if client_list:
+        extras.append(('client list', 'client_list'))
+    if latency:
+        extras.append(('latency latest', 'latency'))
+    if slowlog:
+        extras.append(('slowlog len', 'slowlog_len'))
+        extras.append(('slowlog get %d' % slowlog_max, 'slowlog'))
+    return extras
+
+
+def parse_cluster_nodes(lines):
+    """
+    Parse a CLUSTER NODES reply into (host, port, role, slots) tuples for
+    every reachable node. Replicas report the slots of their master.
+
+    Node lines look like
+    "<id> <ip:port@cport> <flags> <master id> <ping> <pong> <epoch> <link> <slot> ..."
+    """
+    nodes = []
+    master_slots = {}
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 8:
+            continue
+
+        node_id, address, flags, master_id = fields[:4]
+        flags = flags.split(',')
+        if any(flag in CLUSTER_SKIP_FLAGS for flag in flags):
+            continue
+
+        # ip:port@cport, with ",hostname" appended since Redis 7.0
+        host, _, port = address.split(',')[0].split('@')[0].rpartition(':')
+        role = 'master' if 'master' in flags else 'slave'
+        # "[slot->-node]" entries are slots being migrated
+        slots = [slot for slot in fields[8:] if not slot.startswith('[')]
+        if role == 'master':
+            master_slots[node_id] = slots
+        nodes.append((host, int(port), role, master_id, slots))
+
+    return [(host, port, role,
+             slots if role == 'master' else master_slots.get(master_id, []))
+            for host, port, role, master_id, slots in nodes]
+
+
+def compile_role_plans(plan, commandstats=False):
+    """
+    (plan, info commands, wanted, wanted parents) of each replication
+    role, keyed by role name, and by None for a node of unknown role.
+    """
+    plans = {None: (plan,) + compile_info_request(plan, commandstats)}
+    for role in ROLE_ONLY_PATTERNS:
+        others = [pattern for other, pattern in ROLE_ONLY_PATTERNS.items()
+                  if other != role]
+        role_plan = [slot for slot in plan
+                     if not any(p.match(slot[0]) for p in others)]
+        plans[role] = (role_plan,) + compile_info_request(role_plan,
+                                                          commandstats)
+    return plans
+
+
+def apply_role(conf, role):
+    """Switch a node to the metric set of its (new) replication role"""
+    if conf['role'] == role:
+        return
+    if conf['role'] is not None:
+        log_verbose('%s is now a %s' % (conf['conn'].address(), role))
+    plan, info_commands, wanted, wanted_parents = conf['role_plans'][role]
+    conf.update(role=role, plan=plan, info_commands=info_commands,
+                wanted=wanted, wanted_parents=wanted_parents)
+    if conf['last_sent'] is not None:
+        conf['last_sent'] = [None] * len(plan)
+
+
+def derive_conf(parent, host, port, plugin_instance):
+    """Instance conf for a discovered node, sharing the parent's settings"""
+    conf = dict(parent, host=host, port=port, socket=None, busy=False,
+                cluster=False, sentinels=None, nodes=None,
+                commandstats_prev=None,
+                latency_seen={}, slowlog_prev=None)
+    if parent['last_sent'] is not None:
+        conf['last_sent'] = [None] * len(parent['plan'])
+    conf['name'] = plugin_instance
+    conf['values'] = collectd.Values(plugin='redis_info',
+                                     plugin_instance=plugin_instance)
+    conf['self_values'] = collectd.Values(
+        plugin='redis_info', plugin_instance=SELF_PLUGIN_INSTANCE)
+    conf['conn'] = RedisConnection(conf)
+    conf['sampler'] = new_sampler(conf)
+    return conf
+
+
+def refresh_cluster(conf):
+    """
+    Rediscover the nodes of a cluster module once its refresh interval
+    has passed. CLUSTER NODES is asked of the seed first, then of the
+    known nodes, so losing the seed does not lose the topology.
+    """
+    nodes = conf['nodes']
+    if time.time() < conf['topology_at'] + conf['cluster_refresh']:
+        return
+
+    def read(conn):
+        return parse_cluster_nodes(conn.read_bulk_lines())
+
+    topology = None
+    for source in [conf] + list(nodes.values()):
+        if source['busy']:
+            continue
+        topology = request(source['conn'], ['cluster nodes'], read)
+        if topology is not None:
+            break
+    if topology is None:
+        collectd.error('redis_info plugin: Unable to refresh cluster '
+                       'topology from %s' % conf['conn'].address())
+        return
+    conf['topology_at'] = time.time()
+
+    discovered = []
+    for host, port, role, slots in topology:
+        # a node reports itself without an ip until it has met its peers
+        tags = 'role=%s' % role
+        if slots:
+            tags += ' slots=%s' % '_'.join(slots)
+        discovered.append((host or conf['host'], port, role, tags))
+    update_nodes(conf, discovered, conf['instance'])
+
+
+def update_nodes(conf, discovered, prefix):
+    """
+    Replace the nodes of a cluster or Sentinel module with the discovered
+    (host, port, role, tags) ones, keeping the conf and connection of
+    every node already known. New nodes are named "<prefix>-<host:port>".
+    """
+    nodes = conf['nodes']
+    refreshed = collections.OrderedDict()
+    for host, port, role, tags in discovered:
+        address = '%s:%s' % (host, port)
+        node = nodes.pop(address, None)
+        if node is None:
+            log_verbose('Discovered node %s' % address)
+            plugin_instance = address
+            if prefix is not None:
+                plugin_instance = '%s-%s' % (prefix, address)
+            node = derive_conf(conf, host, port, plugin_instance)
+
+        apply_role(node, role)
+        node['values'].meta = {'tsdb_tags': tags}
+        refreshed[address] = node
+
+    for address, node in nodes.items():
+        log_verbose('Node %s is gone' % address)
+        if not node['busy']:
+            node['conn'].close()
+    conf['nodes'] = refreshed
+
+
+def parse_sentinel_replicas(replies):
+    """
+    (host, port) of the reachable replicas in a SENTINEL replicas reply,
+    a list of flat [field, value, ...] lists per replica.
+    """
+    replicas = []
+    for reply in replies:
+        fields = dict(zip(reply[::2], reply[1::2]))
+        flags = fields.get('flags', '').split(',')
+        if any(flag in SENTINEL_SKIP_FLAGS for flag in flags):
+            continue
+        replicas.append((fields['ip'], int(fields['port'])))
+    return replicas
+
+
+def sentinel_conf(parent, address):
+    """Connection settings of a Sentinel given as "host[:port]" """
+    host, sep, port = address.rpartition(':')
+    if not sep:
+        host, port = address, SENTINEL_PORT
+    conf = dict((key, parent[key]) for key in (
+        'backoff', 'max_backoff', 'connect_timeout', 'read_timeout',
+        'timeout'))
+    conf.update(host=host, port=int(port), socket=None,
+                auth=parent['sentinel_auth'], busy=False)
+    conf['conn'] = RedisConnection(conf)
+    return conf
+
+
+def refresh_sentinel(conf):
+    """
+    Ask the Sentinels for the module's current master and replicas once
+    the refresh interval has passed, or right away when the master did
+    not answer its last poll (it may have failed over). Sentinels are
+    tried in order until one answers.
+    """
+    master_down = any(node['role'] == 'master' and
+                      node['conn'].last_error is not None
+                      for node in conf['nodes'].values())
+    if (not master_down and
+            time.time() < conf['topology_at'] + conf['sentinel_refresh']):
+        return
+
+    name = conf['master_name']
+    commands = [('SENTINEL', 'get-master-addr-by-name', name),
+                ('SENTINEL', conf['sentinel_replicas'], name)]
+
+    def read(conn):
+        master = conn.read_reply()
+        try:
+            replicas = parse_sentinel_replicas(conn.read_reply())
+        except RedisError as e:
+            if UNKNOWN_SUBCOMMAND_RE.search(str(e)):
+                # SENTINEL replicas is new in Redis 5.0
+                return master, None
+            collectd.warning('redis_info plugin: %s could not list the '
+                             'replicas of %s - %s'
+                             % (conn.address(), name, e))
+            replicas = []
+        return master, replicas
+
+    topology = None
+    for sentinel in conf['sentinels']:
+        topology = request(sentinel['conn'], commands, read)
+        if topology is not None and topology[1] is None:
+            conf['sentinel_replicas'] = 'slaves'
+            commands[1] = ('SENTINEL', 'slaves', name)
+            topology = request(sentinel['conn'], commands, read)
+        if topology is not None:
+            break
+    if topology is None:
+        collectd.error('redis_info plugin: Unable to ask any Sentinel for '
+                       'master %s' % name)
+        return
+    conf['topology_at'] = time.time()
+
+    master, replicas = topology
+    if master is None:
+        collectd.error('redis_info plugin: Sentinel does not know master %s'
+                       % name)
+        return
+
+    tags = 'master_name=%s role=%%s' % sanitize(name)
+    discovered = [(master[0], int(master[1]), 'master', tags % 'master')]
+    discovered.extend((host, port, 'slave', tags % 'slave')
+                      for host, port in replicas or [])
+    update_nodes(conf, discovered, conf['instance'] or name)
 
 
 def configure_callback(conf):
     """Receive configuration block"""
     host = None
     port = None
+    unix_socket = None
     auth = None
     instance = None
+    backoff = RECONNECT_BACKOFF
+    max_backoff = MAX_RECONNECT_BACKOFF
+    connect_timeout = CONNECT_TIMEOUT
+    read_timeout = READ_TIMEOUT
+    timeout = TOTAL_TIMEOUT
+    cluster = False
+    cluster_refresh = CLUSTER_REFRESH_INTERVAL
+    sentinels = []
+    sentinel_auth = None
+    master_name = None
+    sentinel_refresh = SENTINEL_REFRESH_INTERVAL
+    commandstats = False
+    commandstats_top_n = COMMANDSTATS_TOP_N
+    commandstats_order = COMMANDSTATS_ORDERS[0]
+    suppress_unchanged = False
+    heartbeat = HEARTBEAT_INTERVAL
+    latency = False
+    slowlog = False
+    slowlog_max = SLOWLOG_MAX_ENTRIES
+    config_params = []
+    client_list = False
+    client_idle = CLIENT_IDLE_THRESHOLD
+    sampling = None
+    sample_settings = {
+        'keys': SAMPLE_KEYS, 'time_budget': SAMPLE_TIME_BUDGET,
+        'top_k': SAMPLE_TOP_K, 'prefixes': SAMPLE_PREFIXES,
+        'separator': SAMPLE_PREFIX_SEPARATOR}
+    metrics = []
 
     for node in conf.children:
         key = node.key.lower()
@@ -134,6 +1203,8 @@ def configure_callback(conf):
             host = val
         elif key == 'port':
             port = int(val)
+        elif key == 'socket':
+            unix_socket = val
         elif key == 'auth':
             auth = val
         elif key == 'verbose':
@@ -141,71 +1212,591 @@ def configure_callback(conf):
             VERBOSE_LOGGING = bool(node.values[0]) or VERBOSE_LOGGING
         elif key == 'instance':
             instance = val
+        elif key == 'workers':
+            global WORKERS
+            WORKERS = int(val)
+        elif key == 'cycledeadline':
+            global CYCLE_DEADLINE
+            CYCLE_DEADLINE = float(val)
+        elif key == 'reconnectbackoff':
+            backoff = float(val)
+        elif key == 'maxreconnectbackoff':
+            max_backoff = float(val)
+        elif key == 'connecttimeout':
+            connect_timeout = float(val)
+        elif key == 'readtimeout':
+            read_timeout = float(val)
+        elif key == 'timeout':
+            timeout = float(val)
+        elif key == 'cluster':
+            cluster = bool(val)
+        elif key == 'clusterrefreshinterval':
+            cluster_refresh = float(val)
+        elif key == 'sentinel':
+            sentinels.extend(str(address) for address in node.values)
+        elif key == 'sentinelauth':
+            sentinel_auth = val
+        elif key == 'mastername':
+            master_name = val
+        elif key == 'sentinelrefreshinterval':
+            sentinel_refresh = float(val)
+        elif key == 'latency':
+            latency = bool(val)
+        elif key == 'slowlog':
+            slowlog = bool(val)
+        elif key == 'slowlogmaxentries':
+            slowlog_max = int(val)
+        elif key == 'configget':
+            for param in node.values:
+                if param.lower() not in config_params:
+                    config_params.append(param.lower())
+        elif key == 'clientlist':
+            client_list = bool(val)
+        elif key == 'clientidlethreshold':
+            client_idle = int(val)
+        elif key == 'keyspacesampling':
+            sampling = bool(val)
+        elif key == 'samplekeys':
+            sample_settings['keys'] = int(val)
+        elif key == 'sampletimebudget':
+            sample_settings['time_budget'] = float(val)
+        elif key == 'sampletopk':
+            sample_settings['top_k'] = int(val)
+        elif key == 'sampleprefixes':
+            sample_settings['prefixes'] = int(val)
+        elif key == 'sampleprefixseparator':
+            sample_settings['separator'] = val
+        elif key == 'suppressunchanged':
+            suppress_unchanged = bool(val)
+        elif key == 'heartbeatinterval':
+            heartbeat = int(val)
+        elif key == 'commandstats':
+            commandstats = bool(val)
+        elif key == 'commandstatstopn':
+            commandstats_top_n = int(val)
+        elif key == 'commandstatsorder':
+            if val.lower() not in COMMANDSTATS_ORDERS:
+                collectd.warning('redis_info plugin: CommandStatsOrder must '
+                                 'be one of %s' % ', '.join(COMMANDSTATS_ORDERS))
+            else:
+                commandstats_order = val.lower()
         elif searchObj:
             log_verbose('Matching expression found: key: %s - value: %s' % (searchObj.group(1), val))
-            global REDIS_INFO
-            REDIS_INFO[searchObj.group(1), val] = True
+            if (searchObj.group(1), val) not in metrics:
+                metrics.append((searchObj.group(1), val))
         else:
             collectd.warning('redis_info plugin: Unknown config key: %s.' % key )
             continue
 
-    log_verbose('Configured with host=%s, port=%s, instance name=%s, using_auth=%s' % ( host, port, instance, auth!=None))
+    log_verbose('Configured with host=%s, port=%s, socket=%s, instance name=%s, using_auth=%s' % ( host, port, unix_socket, instance, auth!=None))
 
-    CONFIGS.append( { 'host': host, 'port': port, 'auth':auth, 'instance':instance } )
-
-def dispatch_value(info, key, type, plugin_instance=None, type_instance=None):
-    """Read a key from info response data and dispatch a value"""
-
-
-    if key not in info:
-        collectd.warning('redis_info plugin: Info key not found: %s' % key)
+    if sentinels and master_name is None:
+        collectd.error('redis_info plugin: Sentinel needs a MasterName, '
+                       'ignoring module')
         return
 
-    if plugin_instance is None:
-        plugin_instance = 'unknown redis'
-        collectd.error('redis_info plugin: plugin_instance is not set, Info key: %s' % key)
+    plugin_instance = instance
+    if plugin_instance is None and sentinels:
+        plugin_instance = master_name
+    elif plugin_instance is None and unix_socket is not None:
+        plugin_instance = unix_socket
+    elif plugin_instance is None:
+        plugin_instance = '{host}:{port}'.format(host=host, port=port)
 
-    if not type_instance:
-        type_instance = key
+    role_plans = compile_role_plans(compile_plan(metrics), commandstats)
+    plan, info_commands, wanted, wanted_parents = role_plans[None]
+    extra_commands = compile_extra_commands(
+        latency, slowlog, slowlog_max, config_params, client_list)
+    log_verbose('Requesting %s' % ', '.join(
+        info_commands + [command for command, _ in extra_commands]))
 
+    conf = { 'host': host, 'port': port, 'socket': unix_socket,
+             'auth':auth, 'instance':instance,
+             'backoff': backoff, 'max_backoff': max_backoff, 'busy': False,
+             'connect_timeout': connect_timeout, 'read_timeout': read_timeout,
+             'timeout': timeout,
+             'plan': plan, 'info_commands': info_commands,
+             'wanted': wanted, 'wanted_parents': wanted_parents,
+             'role': None, 'role_plans': role_plans,
+             'cluster': cluster, 'cluster_refresh': cluster_refresh,
+             'sentinels': None, 'sentinel_auth': sentinel_auth,
+             'master_name': master_name,
+             'sentinel_refresh': sentinel_refresh,
+             'sentinel_replicas': 'replicas',
+             'nodes': collections.OrderedDict()
+                      if cluster or sentinels else None,
+             'topology_at': 0,
+             'commandstats': commandstats,
+             'commandstats_top_n': commandstats_top_n,
+             'commandstats_order': commandstats_order,
+             'commandstats_prev': None,
+             'extra_commands': extra_commands,
+             'config_params': config_params, 'client_idle': client_idle,
+             'latency_seen': {}, 'slowlog_prev': None,
+             'heartbeat': heartbeat,
+             'last_sent': [None] * len(plan) if suppress_unchanged else None,
+             'sampling': sample_settings if sampling else None,
+             'name': plugin_instance,
+             'values': collectd.Values(plugin='redis_info',
+                                       plugin_instance=plugin_instance),
+             'self_values': collectd.Values(
+                 plugin='redis_info', plugin_instance=SELF_PLUGIN_INSTANCE) }
+    conf['conn'] = RedisConnection(conf)
+    conf['sampler'] = new_sampler(conf)
+    if sentinels:
+        conf['sentinels'] = [sentinel_conf(conf, address)
+                             for address in sentinels]
+    CONFIGS.append(conf)
+
+def parse_number(text):
     try:
-        value = int(info[key])
+        return int(text)
     except ValueError:
-        value = float(info[key])
+        return float(text)
+
+def compile_plan(metrics):
+    """
+    Turn the configured (info key, type) pairs into the ordered list of
+    (info key, type, type_instance, parser, is_gauge) slots dispatched
+    every cycle
+    """
+    plan = []
+    for key, type in metrics:
+        type_instance = TYPE_INSTANCE_RENAMES.get((key, type), key)
+        is_gauge = type not in INTEGER_TYPES
+        parser = float if is_gauge else parse_number
+        plan.append((key, type, type_instance, parser, is_gauge))
+    return plan
+
+def dispatch_plan(conf, info):
+    """
+    Dispatch every planned key found in the info response, skipping
+    unchanged gauges between heartbeats when suppression is on
+    """
+    template = conf['values']
+    last_sent = conf['last_sent']
+    dispatched = 0
+    for slot, (key, type, type_instance, parser, is_gauge) in enumerate(
+            conf['plan']):
+        text = info.get(key)
+        if text is None:
+            collectd.warning('redis_info plugin: Info key not found: %s' % key)
+            continue
+
+        try:
+            value = parser(text)
+        except ValueError:
+            collectd.warning('redis_info plugin: Info key %s is not numeric: %s'
+                             % (key, text))
+            continue
+
+        if last_sent is not None and is_gauge:
+            last = last_sent[slot]
+            if (last is not None and last[0] == value and
+                    last[1] < conf['heartbeat']):
+                last[1] += 1
+                continue
+            last_sent[slot] = [value, 1]
+
+        if VERBOSE_LOGGING:
+            log_verbose('Sending value: %s=%s' % (type_instance, value))
+        template.dispatch(type=type, type_instance=type_instance,
+                          values=[value])
+        dispatched += 1
+    return dispatched
+
+class WorkerPool(object):
+    """
+    Fixed set of daemon threads that poll instances concurrently.
+
+    Each worker dispatches an instance's values as soon as its reply is
+    parsed, so a read cycle takes as long as the slowest instance rather
+    than the sum of all of them.
+    """
 
-    log_verbose('Sending value: %s=%s' % (type_instance, value))
+    def __init__(self, size):
+        self.tasks = queue.Queue()
+        self.threads = []
+        for i in range(size):
+            thread = threading.Thread(target=self.work,
+                                      name='redis_info-%d' % i)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def work(self):
+        while True:
+            conf, done = self.tasks.get()
+            if conf is None:
+                return
+            try:
+                poll_instance(conf)
+            finally:
+                conf['busy'] = False
+                done.put(conf)
+
+    def run(self, confs, deadline):
+        """
+        Poll confs and wait for them until the deadline passes. Returns
+        the number of instances skipped or still in flight.
+        """
+        done = queue.Queue()
+        pending = 0
+        skipped = 0
+        for conf in confs:
+            if conf['busy']:
+                collectd.warning('redis_info plugin: %s is still being '
+                                 'polled from a previous cycle, skipping'
+                                 % conf['conn'].address())
+                skipped += 1
+                continue
+            conf['busy'] = True
+            self.tasks.put((conf, done))
+            pending += 1
+
+        end = time.time() + deadline
+        while pending:
+            remaining = end - time.time()
+            if remaining <= 0:
+                break
+            try:
+                done.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending -= 1
+
+        if pending:
+            collectd.warning('redis_info plugin: %d instance(s) did not '
+                             'answer within %.1fs' % (pending, deadline))
+        return skipped + pending
+
+    def stop(self):
+        for _ in self.threads:
+            self.tasks.put((None, None))
 
-    val = collectd.Values(plugin='redis_info')
-    val.type = type
-    val.type_instance = type_instance
-    val.plugin_instance = plugin_instance
-    val.values = [value]
-    val.dispatch()
 
 def read_callback():
+    global POOL
+    confs = []
+    for conf in CONFIGS:
+        if conf['cluster']:
+            refresh_cluster(conf)
+            confs.extend(conf['nodes'].values())
+        elif conf['sentinels']:
+            refresh_sentinel(conf)
+            confs.extend(conf['nodes'].values())
+        else:
+            confs.append(conf)
+
+    workers = WORKERS
+    if workers is None:
+        clustered = any(conf['nodes'] is not None for conf in CONFIGS)
+        workers = CLUSTER_WORKERS if clustered else 1
+
+    start = time.time()
+    late = 0
+    if workers <= 1 or len(confs) <= 1:
+        for conf in confs:
+            poll_instance(conf)
+    else:
+        if POOL is None:
+            POOL = WorkerPool(min(workers, len(confs)))
+        late = POOL.run(confs, CYCLE_DEADLINE)
+    dispatch_cycle_stats(time.time() - start, len(confs), late)
+
+def shutdown_callback():
+    if POOL is not None:
+        POOL.stop()
     for conf in CONFIGS:
-        get_metrics( conf )
+        if conf['nodes'] is not None:
+            for node in conf['nodes'].values():
+                if not node['busy']:
+                    node['conn'].close()
+        for sentinel in conf['sentinels'] or []:
+            sentinel['conn'].close()
+        if not conf['busy']:
+            conf['conn'].close()
+
+def poll_instance(conf):
+    """get_metrics, logging any unexpected error so the others still run"""
+    try:
+        get_metrics(conf)
+    except Exception as e:
+        collectd.error('redis_info plugin: Unexpected error polling '
+                       '%s - %r' % (conf['conn'].address(), e))
+
 
 def get_metrics( conf ):
     info = fetch_info( conf )
+    stats = conf['conn'].last_request() if info is not None else None
 
+    dispatched = 0
+    sample_time = None
     if not info:
         collectd.error('redis plugin: No info received')
-        return
+    else:
+        dispatched = dispatch_plan(conf, info)
+        if conf['commandstats'] and 'commandstats' in info:
+            dispatched += dispatch_commandstats(conf, info['commandstats'])
+        if conf['config_params']:
+            dispatched += dispatch_config(conf, info)
+        if 'client_list' in info:
+            dispatched += dispatch_client_list(conf, info['client_list'])
+        if 'latency' in info:
+            dispatched += dispatch_latency(conf, info['latency'])
+        if 'slowlog_len' in info and 'slowlog' in info:
+            dispatched += dispatch_slowlog(conf, info['slowlog_len'],
+                                           info['slowlog'])
+        if conf['sampler'] is not None:
+            start = time.time()
+            if conf['sampler'].sample(conf):
+                dispatched += conf['sampler'].dispatch(conf)
+            sample_time = time.time() - start
+
+    dispatch_self_stats(conf, stats, dispatched, sample_time)
+
+
+def dispatch_commandstats(conf, stats):
+    """
+    Dispatch calls/s, usec/s and usec/call since the previous cycle for
+    the top N commands, and the same rates summed over all other commands
+    as "other", to keep the number of series bounded. Returns the number
+    of values dispatched.
+    """
+    now = time.time()
+    prev = conf['commandstats_prev']
+    conf['commandstats_prev'] = (now, stats)
+    if prev is None:
+        return 0
+
+    prev_at, prev_stats = prev
+    elapsed = now - prev_at
+    if elapsed <= 0:
+        return 0
+
+    deltas = []
+    for command, (calls, usec) in stats.items():
+        prev_calls, prev_usec = prev_stats.get(command, (0, 0))
+        if calls < prev_calls or usec < prev_usec:
+            # counters were reset (CONFIG RESETSTAT or restart)
+            prev_calls, prev_usec = 0, 0
+        deltas.append((command, calls - prev_calls, usec - prev_usec))
 
-    plugin_instance = conf['instance']
-    if plugin_instance is None:
-        plugin_instance = '{host}:{port}'.format(host=conf['host'], port=conf['port'])
+    order = 1 if conf['commandstats_order'] == 'calls' else 2
+    deltas.sort(key=lambda delta: delta[order], reverse=True)
 
-    for keyTuple, val in REDIS_INFO.iteritems():
-        key, val = keyTuple
+    top = deltas[:conf['commandstats_top_n']]
+    rest = deltas[conf['commandstats_top_n']:]
+    if rest:
+        top.append(('other', sum(delta[1] for delta in rest),
+                    sum(delta[2] for delta in rest)))
 
-        if key == 'total_connections_received' and val == 'counter':
-            dispatch_value(info, 'total_connections_received', 'counter', plugin_instance, 'connections_received')
-        elif key == 'total_commands_processed' and val == 'counter':
-            dispatch_value(info, 'total_commands_processed', 'counter', plugin_instance, 'commands_processed')
+    template = conf['values']
+    dispatched = 0
+    for command, calls, usec in top:
+        prefix = 'cmdstat_%s_' % sanitize(command)
+        template.dispatch(type='gauge', type_instance=prefix + 'calls_per_sec',
+                          values=[calls / elapsed])
+        template.dispatch(type='gauge', type_instance=prefix + 'usec_per_sec',
+                          values=[usec / elapsed])
+        dispatched += 2
+        if calls:
+            template.dispatch(type='gauge',
+                              type_instance=prefix + 'usec_per_call',
+                              values=[float(usec) / calls])
+            dispatched += 1
+    return dispatched
+
+
+def dispatch_config(conf, info):
+    """
+    Dispatch the numeric CONFIG GET replies as config_<parameter>.
+    Returns the number of values dispatched.
+
+    Replies are flat [parameter, value] lists, empty when the server
+    has no such parameter.
+    """
+    template = conf['values']
+    dispatched = 0
+    for param in conf['config_params']:
+        reply = info.get('config_' + param)
+        if not reply or len(reply) < 2:
+            continue
+        try:
+            value = parse_number(reply[1])
+        except ValueError:
+            log_verbose('Config %s is not numeric: %s' % (param, reply[1]))
+            continue
+        template.dispatch(type='gauge', type_instance='config_' + param,
+                          values=[value])
+        dispatched += 1
+    return dispatched
+
+
+def parse_client_list(text, idle_threshold):
+    """
+    Count the connections of a CLIENT LIST reply by kind, plus the
+    blocked ones, the ones idle for idle_threshold seconds or more and
+    the total output buffer memory.
+
+    Lines look like
+    "id=3 addr=10.0.0.1:52555 fd=8 name= age=85 idle=0 flags=N ... omem=0 ..."
+    """
+    counts = dict((kind, 0) for _, kind in CLIENT_KINDS)
+    counts.update({'normal': 0, 'blocked': 0, 'idle': 0, 'omem': 0})
+    for line in text.splitlines():
+        fields = dict(field.partition('=')[::2] for field in line.split())
+        flags = fields.get('flags', '')
+        for flag, kind in CLIENT_KINDS:
+            if flag in flags:
+                counts[kind] += 1
+                break
         else:
-            dispatch_value(info, key, val, plugin_instance)
+            counts['normal'] += 1
+        if 'b' in flags:
+            counts['blocked'] += 1
+        if int(fields.get('idle', 0)) >= idle_threshold:
+            counts['idle'] += 1
+        counts['omem'] += int(fields.get('omem', 0))
+    return counts
+
+
+def dispatch_client_list(conf, text):
+    """Dispatch the CLIENT LIST counts, returns the number of values sent"""
+    counts = parse_client_list(text, conf['client_idle'])
+    omem = counts.pop('omem')
+    template = conf['values']
+    for kind, count in sorted(counts.items()):
+        template.dispatch(type='count', type_instance='clients_' + kind,
+                          values=[count])
+    template.dispatch(type='bytes', type_instance='clients_output_memory',
+                      values=[omem])
+    return len(counts) + 1
+
+
+def dispatch_latency(conf, events):
+    """
+    Dispatch, for every event of a LATENCY LATEST reply, the latency in
+    milliseconds of its latest spike if that happened since the previous
+    cycle (0 otherwise) and its all-time max. Returns the number of values
+    dispatched.
+
+    Events look like ["command", <unix time>, <latest ms>, <max ms>]
+    """
+    seen = conf['latency_seen']
+    template = conf['values']
+    dispatched = 0
+    for event in events:
+        name, timestamp, latest, highest = event[:4]
+        prev = seen.get(name)
+        seen[name] = timestamp
+        # an event seen for the first time may be long over
+        spike = latest if prev is not None and timestamp != prev else 0
+
+        prefix = 'latency_%s_' % sanitize(name)
+        template.dispatch(type='gauge', type_instance=prefix + 'ms',
+                          values=[spike])
+        template.dispatch(type='gauge', type_instance=prefix + 'max_ms',
+                          values=[highest])
+        dispatched += 2
+    return dispatched
+
+
+def dispatch_slowlog(conf, length, entries):
+    """
+    Dispatch the slow log length, the rate of new entries since the
+    previous cycle and the longest of them in microseconds. Returns the
+    number of values dispatched.
+
+    Entries come newest first as [<id>, <unix time>, <usec>, <args>, ...];
+    ids grow by one per entry, so the rate holds even when more entries
+    were logged than SLOWLOG GET returned.
+    """
+    now = time.time()
+    prev = conf['slowlog_prev']
+    newest = entries[0][0] if entries else None
+    if newest is None and prev is not None:
+        newest = prev[1]
+    conf['slowlog_prev'] = (now, newest)
+
+    template = conf['values']
+    template.dispatch(type='gauge', type_instance='slowlog_length',
+                      values=[length])
+    if prev is None or now <= prev[0]:
+        return 1
+
+    prev_at, last_id = prev
+    if last_id is None:
+        fresh = entries
+        count = len(fresh)
+    elif newest < last_id:
+        # the server restarted and ids started over from 0
+        fresh = entries
+        count = newest + 1
+    else:
+        fresh = [entry for entry in entries if entry[0] > last_id]
+        count = newest - last_id
+
+    longest = max([entry[2] for entry in fresh] or [0])
+    template.dispatch(type='gauge', type_instance='slowlog_entries_per_sec',
+                      values=[count / (now - prev_at)])
+    template.dispatch(type='gauge', type_instance='slowlog_max_usec',
+                      values=[longest])
+    return 3
+
+
+def dispatch_self_stats(conf, stats, dispatched, sample_time=None):
+    """
+    Dispatch how the instance's info request went: connect time, round
+    trip (sending and waiting on replies), parse time and bytes received
+    when it was answered (stats is RedisConnection.last_request()),
+    the keyspace sampling time, the values dispatched and the reconnect,
+    failure and timeout counters.
+    """
+    conn = conf['conn']
+    template = conf['self_values']
+    prefix = conf['name'] + '-'
+
+    if stats is None and conn.connect_time is not None:
+        template.dispatch(type='duration', type_instance=prefix + 'connect',
+                          values=[conn.connect_time])
+    if stats is not None:
+        connect_time, io_time, request_time, bytes_received = stats
+        if connect_time is not None:
+            template.dispatch(type='duration',
+                              type_instance=prefix + 'connect',
+                              values=[connect_time])
+        parse_time = max(0.0, request_time - io_time - (connect_time or 0))
+        template.dispatch(type='duration', type_instance=prefix + 'roundtrip',
+                          values=[io_time])
+        template.dispatch(type='duration', type_instance=prefix + 'parse',
+                          values=[parse_time])
+        template.dispatch(type='bytes', type_instance=prefix + 'received',
+                          values=[bytes_received])
+    if sample_time is not None:
+        template.dispatch(type='duration', type_instance=prefix + 'sampling',
+                          values=[sample_time])
+
+    template.dispatch(type='count', type_instance=prefix + 'dispatched',
+                      values=[dispatched])
+    template.dispatch(type='counter', type_instance=prefix + 'reconnects',
+                      values=[conn.reconnects])
+    template.dispatch(type='counter', type_instance=prefix + 'failures',
+                      values=[conn.failures])
+    template.dispatch(type='counter', type_instance=prefix + 'timeouts',
+                      values=[conn.timeouts])
+
+
+def dispatch_cycle_stats(duration, polled, late):
+    """Dispatch the read cycle's duration and instance counts"""
+    template = collectd.Values(plugin='redis_info',
+                               plugin_instance=SELF_PLUGIN_INSTANCE)
+    template.dispatch(type='duration', type_instance='cycle-duration',
+                      values=[duration])
+    template.dispatch(type='count', type_instance='cycle-instances',
+                      values=[polled])
+    template.dispatch(type='count', type_instance='cycle-late',
+                      values=[late])
 
 
 def log_verbose(msg):
@@ -217,3 +1808,4 @@ def log_verbose(msg):
 # register callbacks
 collectd.register_config(configure_callback)
 collectd.register_read(read_callback)
+collectd.register_shutdown(shutdown_callback)
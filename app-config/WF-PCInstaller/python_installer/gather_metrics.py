@@ -10,7 +10,6 @@ It first checks the dependency this module needs.
 Detects application and calls the appropriate plugin installer.
 Catches ctrl+c, which exits the system with return code of 1.
 """
-import socket
 import sys
 from datetime import datetime
 import re
@@ -21,6 +20,8 @@ import argparse
 
 import common.conf_collectd_plugin as conf
 import common.install_utils as utils
+import common.install_log as install_log
+import common.process_utils as process_utils
 import common.config as config
 
 # Python required base version
@@ -29,6 +30,10 @@ REQ_VERSION = (2, 7)
 INCOMPLETE = 2
 NEW = 1
 INSTALLED = 0
+# the one line installer's own process, whose cmdline names every app
+SELF_RE = re.compile(
+    r'bash -c #!/bin/bash(.*)Install Wavefront Proxy and '
+    'configures(.*)function logo')
 
 
 def usage():
@@ -66,108 +71,100 @@ def check_version():
     utils.print_success()
 
 
-def port_scan(host, port):
-    """ Deprecated
-    Using ipv4, TCP connection to test whether a port is
-    being used.
-    """
-    # AF_INET specifies ipv4, SOCK_STREAM for TCP
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
-    try:
-        sock.connect((host, port))
-    except socket.error:
-        return False
-    except KeyboardInterrupt:
-        utils.cprint('Scanning interrupted')
-        sys.exit()
-    except socket.gaierror:
-        utils.cprint('Hostname could not be resolved')
-        sys.exit()
-    else:
-        return port
-    finally:
-        sock.close()
-
-
-def check_app(output, app_dict):
+def check_app_command(app_dict):
     """
     Input:
-        output string:
-            the result of ps -ef
         app_dict {}:
             the dictionary that hold's the app's information.
             This is reading from support_plugins.json
 
     Output:
-        return true if the app is running
+        return true if one of the app's commands is installed
 
     Description:
-        checks if the keyword from support_plugins can be matched
-        in ps -ef output.
-        if not, check if the command matches
+        used when the app was not found running
 
         Note: lax search, but user has potentially more options
         to pick installers
-
     """
-    app_search = app_dict['app_search']
-    app_cmds = app_dict['command'].split('|')
-
-    # lax app search
-    app_re = re.compile(
-        r'({app_search})'.format(
-            app_search=app_search))
-    # prevent self detection
-    script_re = re.compile(
-        r'root(.*)bash -c #!/bin/bash(.*)Install Wavefront Proxy and '
-        'configures(.*)function logo')
-
-    app_found = False
-    for line in output.decode().split('\n'):
-        self_res = script_re.match(line)
-
-        if self_res is None:
-            app_found = app_re.search(line)
-            if app_found is not None:
-                if config.DEBUG:
-                    utils.eprint(line)
-                return True
-        else:
-            if config.DEBUG:
-                utils.eprint(
-                    'Detected self with match:\n{}'.format(
-                        self_res.group()))
-
-    # check command if app is not found running
-    if app_found is None:
-        for cmd in app_cmds:
-            if config.DEBUG:
-                utils.eprint('Command: {}'.format(cmd))
-            if cmd == "None":
-                return False
-            elif utils.command_exists(cmd):
-                return True
+    for cmd in app_dict['command'].split('|'):
+        if config.DEBUG:
+            utils.eprint('Command: {}'.format(cmd))
+        if cmd == "None":
+            return False
+        elif utils.command_exists(cmd):
+            return True
 
     return False
 
 
+def load_plugin_registry(plugins_file):
+    """
+    Input:
+        plugins_file string:
+            path of support_plugins.json
+    Output:
+        plugin_dict {}:
+            the plugins of support_plugins.json
+        matcher process_utils.ProcessMatcher:
+            every app's app_search, compiled together
+    """
+    try:
+        with open(plugins_file) as data_file:
+            data = json.load(data_file)
+    except (IOError, OSError) as e:
+        utils.exit_with_message(e)
+    except Exception as e:
+        utils.exit_with_message(
+            'Improper JSON format in {}.\n'
+            'Error: {}'.format(plugins_file, e))
+
+    plugin_dict = data['data']['plugins']
+    matcher = process_utils.ProcessMatcher(
+        [(app, plugin_dict[app]['app_search']) for app in plugin_dict])
+    return plugin_dict, matcher
+
+
+def find_running_apps(matcher):
+    """
+    Input:
+        matcher process_utils.ProcessMatcher:
+            the app_search of every app, see load_plugin_registry
+    Output:
+        running {app: []Process}:
+            the processes matching each app's app_search
+
+    Description:
+        reads the process table once and matches every
+        app_search against each cmdline in a single pass
+    """
+    processes = process_utils.list_processes()
+    if not processes:
+        utils.exit_with_message('Unable to read process off the machine')
+
+    running = matcher.match_processes(processes, exclude=SELF_RE)
+
+    if config.DEBUG:
+        for app in running:
+            for process in running[app]:
+                utils.eprint('{}: {} {} {}'.format(
+                    app, process.pid, process.user, process.cmdline))
+    return running
+
+
 def detect_used_ports():
-    """ Deprecated
-    Scan through localhost 0-1024 ports
     """
-    MAX_PORT = 1025
-    DEFAULT_HOST = '127.0.0.1'
-    open_ports = []
-    socket.setdefaulttimeout(1)
-    for port in range(0, MAX_PORT):
-        res = port_scan(DEFAULT_HOST, port)
-        if res:
-            open_ports.append(port)
-        # debugging purpose to see if program is running
-        if port % 5000 == 0 and port != 0:
-            sys.stderr.write('.')
-    return open_ports
+    Output:
+        open_ports []int:
+            the TCP ports listened on, sorted
+
+    Description:
+        reads /proc/net/tcp and tcp6 once instead of
+        trying to connect to each port
+    """
+    sockets = process_utils.read_listening_sockets()
+    return sorted(set(
+        port for _, _, port in sockets.values() if port is not None))
 
 
 def detect_applications():
@@ -175,9 +172,14 @@ def detect_applications():
     Detect applications and provide the appropriate plugin information
 
     Description:
-        This function uses unix command ps -ef and check whether
+        This function reads the process table and checks whether
         the supported application is found.
         Check current plugin support in support_plugin.json
+        The matching processes of a running app are kept in
+        its dictionary under 'processes' as a list of
+        process_utils.Process (pid, user, comm, cmdline),
+        and the sockets they listen on under 'listeners'
+        as a list of process_utils.Listener.
 
     Input:
         None
@@ -191,41 +193,37 @@ def detect_applications():
     plugins_file = config.PLUGINS_FILE_PATH
     utils.print_step('Begin app detection')
 
-    res = utils.get_command_output('ps -ef')
-    if res is None:
-        utils.exit_with_message('Unable to read process off the machine')
-
-    try:
-        data_file = open(plugins_file)
-    except (IOError, OSError) as e:
-        utils.exit_with_message(e)
-    except Exception as e:
-        utils.exit_with_message(
-            'Cannot read support_plugins.json.\n'
-            'Unexpected error: {}.'.format(e))
-
-    try:
-        data = json.load(data_file)
-    except Exception as e:
-        utils.cprint(
-            'Improper JSON format.\n'
-            'Error: {}'.format(e))
-    finally:
-        data_file.close()
-
-    data = data['data']
-
-    plugin_dict = data['plugins']
+    plugin_dict, matcher = load_plugin_registry(plugins_file)
     support_dict = {}
     support_list = []
 
+    running = find_running_apps(matcher)
+    # one parallel pass over the processes of every app,
+    # containers included
+    listeners = process_utils.find_listeners(
+        [process.pid for app in running for process in running[app]])
     for app in plugin_dict:
         app_dict = plugin_dict[app]
-        if check_app(res, app_dict):
+        if app in running or check_app_command(app_dict):
             if config.AGENT in app_dict:
+                app_dict['processes'] = running.get(app, [])
+                pids = set(
+                    process.pid for process in app_dict['processes'])
+                app_dict['listeners'] = [
+                    listener for listener in listeners
+                    if listener.pid in pids]
+                if config.DEBUG:
+                    for listener in app_dict['listeners']:
+                        utils.eprint('{}: listening on {} {} {} {}'.format(
+                            app, listener.family, listener.address,
+                            listener.port, listener.container or ''))
                 support_list.append(app)
                 support_dict[app] = app_dict
 
+    install_log.log(
+        'apps detected', apps=support_list,
+        processes=sum(len(procs) for procs in running.values()),
+        listeners=len(listeners))
     if len(support_list):
         return (support_list, support_dict)
     else:
@@ -360,6 +358,9 @@ def installer_menu(app_list, support_dict):
                         install_state[app]['state'] = INCOMPLETE
                     install_state[app]['date'] = '{:%c}'.format(
                         datetime.now())
+                    install_log.log(
+                        'install state updated', plugin=app,
+                        state=install_state[app]['state'])
                     update_install_state(config.AGENT, install_state_dict)
             else:
                 utils.print_reminder('Invalid option.')
@@ -403,7 +404,9 @@ def run_installer(agent, app_dict, TEST=False):
         config.OPERATING_SYSTEM,
         agent,
         app_dict[agent]['plugin_name'],
-        app_dict['conf_name'])
+        app_dict['conf_name'],
+        processes=app_dict.get('processes'),
+        listeners=app_dict.get('listeners'))
 
     return instance.install()
 
@@ -640,15 +643,23 @@ def main():
     if config.DEBUG:
         utils.print_warn('DEBUG IS ON')
 
-    (app_list, app_dict) = detect_applications()
+    install_log.log(
+        'installer started', os=config.OPERATING_SYSTEM,
+        agent=config.AGENT, test=config.TEST)
+    with install_log.phase('detect'):
+        (app_list, app_dict) = detect_applications()
 
     try:
         if config.TEST:
-            test_installer(app_list, app_dict)
+            with install_log.phase('test'):
+                test_installer(app_list, app_dict)
         else:
             # if at least one installer is ran to completion,
             # then exit with success
-            if installer_menu(app_list, app_dict):
+            with install_log.phase('menu'):
+                count = installer_menu(app_list, app_dict)
+            install_log.log('installer finished', installed=count)
+            if count:
                 sys.exit(0)
             else:
                 sys.exit(1)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+"""
+Offline benchmark of the redis_info collectd plugin.
+
+Loads plugin_extension/redis_info.py against fake_collectd and polls
+fake_redis servers, reporting per read cycle throughput, latency and
+memory allocated for each instance count.
+
+python bench_redis_info.py -h
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_DIR = os.path.join(
+    BENCH_DIR, os.pardir, 'WF-PCInstaller', 'plugin_extension')
+sys.path.insert(0, BENCH_DIR)
+
+import fake_collectd
+from fake_redis import FakeRedisServer
+
+# the metrics RedisConfigurator writes for a master
+DEFAULT_METRICS = [
+    ('uptime_in_seconds', 'gauge'), ('used_cpu_sys', 'counter'),
+    ('used_cpu_user', 'counter'), ('used_cpu_sys_children', 'counter'),
+    ('used_cpu_user_children', 'counter'), ('uptime_in_days', 'gauge'),
+    ('lru_clock', 'counter'), ('connected_clients', 'gauge'),
+    ('connected_slaves', 'gauge'), ('client_longest_output_list', 'gauge'),
+    ('client_biggest_input_buf', 'gauge'), ('blocked_clients', 'gauge'),
+    ('expired_keys', 'counter'), ('evicted_keys', 'counter'),
+    ('rejected_connections', 'counter'), ('used_memory', 'bytes'),
+    ('used_memory_rss', 'bytes'), ('used_memory_peak', 'bytes'),
+    ('used_memory_lua', 'bytes'), ('mem_fragmentation_ratio', 'gauge'),
+    ('changes_since_last_save', 'gauge'),
+    ('instantaneous_ops_per_sec', 'gauge'),
+    ('rdb_bgsave_in_progress', 'gauge'),
+    ('total_connections_received', 'counter'),
+    ('total_commands_processed', 'counter'),
+    ('total_net_input_bytes', 'counter'),
+    ('total_net_output_bytes', 'counter'), ('keyspace_hits', 'derive'),
+    ('keyspace_misses', 'derive'), ('latest_fork_usec', 'gauge'),
+    ('repl_backlog_first_byte_offset', 'gauge'),
+    ('master_repl_offset', 'gauge'),
+]
+
+
+def load_plugin():
+    """Import a fresh copy of redis_info against fake_collectd"""
+    fake_collectd.install()
+    fake_collectd.reset()
+    sys.modules.pop('redis_info', None)
+    if PLUGIN_DIR not in sys.path:
+        sys.path.insert(0, PLUGIN_DIR)
+    import redis_info
+    return redis_info
+
+
+def configure(ports, password, options):
+    C = fake_collectd.Config
+    for i, port in enumerate(ports):
+        children = [
+            C('Host', ['127.0.0.1']), C('Port', [port]),
+            C('Instance', ['bench%d' % i])]
+        if password is not None:
+            children.append(C('Auth', [password]))
+        children.extend(C(key, [value]) for key, value in options)
+        children.extend(
+            C('Redis_' + key, [type]) for key, type in DEFAULT_METRICS)
+        fake_collectd.callbacks['config'](C('Module', children=children))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = int(round((len(ordered) - 1) * pct / 100.0))
+    return ordered[index]
+
+
+def run_scenario(instances, args):
+    server = FakeRedisServer(
+        instances=instances, info_keys=args.info_keys, keys=args.keys,
+        latency=args.latency, password=args.auth).start()
+    load_plugin()
+    fake_collectd.record = False
+    configure(server.ports, args.auth, args.option)
+    read = fake_collectd.callbacks['read']
+
+    try:
+        for _ in range(args.warmup):
+            read()
+
+        dispatched = fake_collectd.dispatch_count
+        latencies = []
+        started = time.time()
+        for _ in range(args.cycles):
+            start = time.time()
+            read()
+            latencies.append(time.time() - start)
+        elapsed = time.time() - started
+        dispatched = fake_collectd.dispatch_count - dispatched
+
+        alloc = None
+        if tracemalloc is not None and hasattr(tracemalloc, 'reset_peak'):
+            peaks = []
+            tracemalloc.start()
+            for _ in range(min(args.cycles, 20)):
+                base, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                read()
+                _, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - base)
+            tracemalloc.stop()
+            alloc = sum(peaks) / float(len(peaks)) / 1024
+    finally:
+        fake_collectd.callbacks['shutdown']()
+        server.stop()
+
+    errors = [msg for level, msg in fake_collectd.logs if level == 'error']
+    return {
+        'instances': instances,
+        'cycles_per_sec': args.cycles / elapsed,
+        'p50': percentile(latencies, 50) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'values': dispatched / float(args.cycles),
+        'alloc': alloc,
+        'errors': len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark redis_info.py against fake Redis servers')
+    parser.add_argument(
+        '--instances', default='1,10,100',
+        help='Comma separated instance counts to run (default: 1,10,100)')
+    parser.add_argument(
+        '--cycles', type=int, default=50,
+        help='Read cycles measured per instance count')
+    parser.add_argument(
+        '--warmup', type=int, default=3,
+        help='Read cycles run before measuring')
+    parser.add_argument(
+        '--info-keys', type=int, default=150,
+        help='Approximate number of keys in a full INFO reply')
+    parser.add_argument(
+        '--keys', type=int, default=1000,
+        help='Number of keys in each fake server\'s keyspace')
+    parser.add_argument(
+        '--latency', type=float, default=0.0,
+        help='Seconds the fake servers wait before each reply')
+    parser.add_argument(
+        '--auth', default=None,
+        help='Password the fake servers require')
+    parser.add_argument(
+        '--option', nargs=2, action='append', default=[],
+        metavar=('KEY', 'VALUE'),
+        help='Extra <Module redis_info> option, e.g. --option Workers 8')
+    args = parser.parse_args()
+
+    # config values arrive typed from collectd
+    args.option = [(key, coerce(value)) for key, value in args.option]
+
+    rowf = '{:>9} {:>10} {:>9} {:>9} {:>12} {:>14} {:>7}'
+    print(rowf.format(
+        'instances', 'cycles/s', 'p50 ms', 'p99 ms', 'values/cycle',
+        'KiB/cycle', 'errors'))
+    for instances in [int(n) for n in args.instances.split(',')]:
+        res = run_scenario(instances, args)
+        alloc = 'n/a' if res['alloc'] is None else '%.1f' % res['alloc']
+        print(rowf.format(
+            res['instances'], '%.1f' % res['cycles_per_sec'],
+            '%.2f' % res['p50'], '%.2f' % res['p99'],
+            '%.0f' % res['values'], alloc, res['errors']))
+
+
+def coerce(value):
+    if value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    for kind in (int, float):
+        try:
+            return kind(value)
+        except ValueError:
+            pass
+    return value
+
+
+if __name__ == '__main__':
+    main()
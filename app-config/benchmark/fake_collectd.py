@@ -0,0 +1,94 @@
+"""
+In-process stand-in for collectd's python module.
+
+install() puts it in sys.modules as "collectd" so plugins such as
+redis_info.py can be imported outside of collectd. Dispatched values
+are counted (and kept when record is on) instead of being written.
+"""
+import sys
+import threading
+
+_lock = threading.Lock()
+callbacks = {}
+dispatched = []
+dispatch_count = 0
+record = True
+logs = []
+
+
+class Config(object):
+    """A config node as collectd hands it to configure callbacks"""
+
+    def __init__(self, key, values=(), children=()):
+        self.key = key
+        self.values = tuple(values)
+        self.children = tuple(children)
+
+
+class Values(object):
+    def __init__(self, type=None, values=None, plugin_instance=None,
+                 type_instance=None, plugin=None, host=None, time=None,
+                 interval=None, meta=None):
+        self.type = type
+        self.values = values
+        self.plugin_instance = plugin_instance
+        self.type_instance = type_instance
+        self.plugin = plugin
+        self.host = host
+        self.time = time
+        self.interval = interval
+        self.meta = meta
+
+    def dispatch(self, **overrides):
+        global dispatch_count
+        with _lock:
+            dispatch_count += 1
+            if record:
+                value = dict(
+                    plugin=self.plugin, plugin_instance=self.plugin_instance,
+                    type=self.type, type_instance=self.type_instance,
+                    values=self.values, meta=self.meta)
+                value.update(overrides)
+                dispatched.append(value)
+
+
+def _logger(level):
+    def log(msg):
+        logs.append((level, msg))
+    return log
+
+
+debug = _logger('debug')
+info = _logger('info')
+notice = _logger('notice')
+warning = _logger('warning')
+error = _logger('error')
+
+
+def register_config(callback, *args, **kwargs):
+    callbacks['config'] = callback
+
+
+def register_init(callback, *args, **kwargs):
+    callbacks['init'] = callback
+
+
+def register_read(callback, *args, **kwargs):
+    callbacks['read'] = callback
+
+
+def register_shutdown(callback, *args, **kwargs):
+    callbacks['shutdown'] = callback
+
+
+def reset():
+    """Forget callbacks, dispatched values and log lines"""
+    global dispatch_count
+    callbacks.clear()
+    del dispatched[:]
+    del logs[:]
+    dispatch_count = 0
+
+
+def install():
+    sys.modules['collectd'] = sys.modules[__name__]
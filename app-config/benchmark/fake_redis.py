@@ -0,0 +1,350 @@
+"""
+A local stand-in for one or more Redis servers, good enough for
+redis_info.py: it answers AUTH, PING, INFO [section], SCAN, TYPE,
+MEMORY USAGE, LATENCY LATEST, SLOWLOG LEN/GET, CONFIG GET and CLIENT LIST
+over inline or RESP commands, with a configurable payload size, keyspace
+size and reply latency.
+
+All instances are served from a single select() loop on one thread,
+each on its own ephemeral port.
+"""
+import heapq
+import select
+import socket
+import threading
+import time
+
+KEY_TYPES = {
+    'user': b'hash', 'session': b'string', 'queue': b'list',
+    'leaderboard': b'zset'}
+KEY_PREFIXES = sorted(KEY_TYPES)
+CONFIG = {'maxmemory': '1073741824', 'maxclients': '10000',
+          'maxmemory-policy': 'noeviction'}
+SECTIONS = (
+    'server', 'clients', 'memory', 'persistence', 'stats',
+    'replication', 'cpu', 'commandstats', 'keyspace')
+
+
+class FakeRedisServer(object):
+    """
+    Serve instances fake Redis servers on 127.0.0.1.
+
+    info_keys: approximate number of keys in a full INFO reply, padded
+        with generated commandstats and keyspace lines
+    keys: number of keys in each instance's keyspace, named
+        "<prefix>:<n>" over a few prefixes with sizes growing with n
+    latency: seconds to wait before sending each reply
+    password: when set, commands other than AUTH are refused until
+        the connection authenticates
+    """
+
+    def __init__(self, instances=1, info_keys=150, keys=1000, latency=0.0,
+                 password=None, host='127.0.0.1'):
+        self.host = host
+        self.latency = latency
+        self.password = password
+        self.info_keys = info_keys
+        self.keys = ['%s:%d' % (KEY_PREFIXES[i % len(KEY_PREFIXES)], i)
+                     for i in range(keys)]
+        self.listeners = []
+        self.ports = []
+        for _ in range(instances):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((host, 0))
+            sock.listen(128)
+            sock.setblocking(False)
+            self.listeners.append(sock)
+            self.ports.append(sock.getsockname()[1])
+
+        self.clients = {}
+        # (due time, sequence, socket, reply) waiting for their latency
+        self.scheduled = []
+        self.sequence = 0
+        self.requests = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.loop, name='fake_redis')
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        for sock in list(self.clients) + self.listeners:
+            sock.close()
+        self.clients = {}
+
+    # event loop
+    def loop(self):
+        while self.running:
+            timeout = 0.05
+            if self.scheduled:
+                timeout = max(0, min(timeout,
+                                     self.scheduled[0][0] - time.time()))
+            readable, _, _ = select.select(
+                self.listeners + list(self.clients), [], [], timeout)
+
+            for sock in readable:
+                if sock in self.listeners:
+                    self.accept(sock)
+                else:
+                    self.receive(sock)
+
+            now = time.time()
+            while self.scheduled and self.scheduled[0][0] <= now:
+                _, _, sock, reply = heapq.heappop(self.scheduled)
+                if sock in self.clients:
+                    try:
+                        sock.sendall(reply)
+                    except socket.error:
+                        self.drop(sock)
+
+    def accept(self, listener):
+        try:
+            sock, _ = listener.accept()
+        except socket.error:
+            return
+        sock.setblocking(True)
+        # like redis, don't hold back small replies
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.clients[sock] = {'buffer': b'', 'authed': self.password is None}
+
+    def drop(self, sock):
+        self.clients.pop(sock, None)
+        sock.close()
+
+    def receive(self, sock):
+        try:
+            data = sock.recv(65536)
+        except socket.error:
+            data = b''
+        if not data:
+            self.drop(sock)
+            return
+
+        client = self.clients[sock]
+        client['buffer'] += data
+        while True:
+            command, client['buffer'] = parse_command(client['buffer'])
+            if command is None:
+                break
+            self.requests += 1
+            self.sequence += 1
+            heapq.heappush(self.scheduled, (
+                time.time() + self.latency, self.sequence, sock,
+                self.reply(client, command)))
+
+    # commands
+    def reply(self, client, command):
+        name = command[0].lower() if command else ''
+        args = command[1:]
+
+        if name == 'auth':
+            if args and args[-1] == self.password:
+                client['authed'] = True
+                return b'+OK\r\n'
+            return b'-ERR invalid password\r\n'
+        if not client['authed']:
+            return b'-NOAUTH Authentication required.\r\n'
+
+        if name == 'ping':
+            return b'+PONG\r\n'
+        if name == 'info':
+            return bulk(self.info(args[0].lower() if args else None))
+        if name == 'scan':
+            cursor = int(args[0])
+            count = 10
+            if len(args) > 2 and args[1].lower() == 'count':
+                count = int(args[2])
+            batch = self.keys[cursor:cursor + count]
+            cursor += count
+            if cursor >= len(self.keys):
+                cursor = 0
+            return (b'*2\r\n' + bulk(str(cursor)) +
+                    array([bulk(key) for key in batch]))
+        if name == 'type':
+            if args[0] not in self.key_index():
+                return b'+none\r\n'
+            return b'+' + KEY_TYPES[args[0].split(':')[0]] + b'\r\n'
+        if name == 'memory' and len(args) > 1 and args[0].lower() == 'usage':
+            index = self.key_index().get(args[1])
+            if index is None:
+                return b'$-1\r\n'
+            return (':%d\r\n' % (64 + index * 16)).encode()
+        if name == 'config' and len(args) > 1 and args[0].lower() == 'get':
+            param = args[1].lower()
+            if param not in CONFIG:
+                return array([])
+            return array([bulk(param), bulk(CONFIG[param])])
+        if name == 'client' and args and args[0].lower() == 'list':
+            return bulk('\n'.join(
+                'id=%d addr=127.0.0.1:%d fd=%d name= age=100 idle=%d '
+                'flags=%s db=0 sub=0 psub=0 multi=-1 qbuf=0 qbuf-free=0 '
+                'obl=0 oll=0 omem=%d events=r cmd=info'
+                % (sock.fileno(), 40000 + sock.fileno(), sock.fileno(),
+                   self.requests % 600, 'S' if i == 0 else 'N', i * 100)
+                for i, sock in enumerate(self.clients)) + '\n')
+        if name == 'latency' and args and args[0].lower() == 'latest':
+            # a new "command" spike every 10 requests
+            return array([array([
+                bulk('command'), integer(1500000000 + self.requests // 10),
+                integer(self.requests % 50), integer(250)])])
+        if name == 'slowlog' and args and args[0].lower() == 'len':
+            return integer(min(128, self.requests // 5))
+        if name == 'slowlog' and args and args[0].lower() == 'get':
+            count = int(args[1]) if len(args) > 1 else 10
+            newest = self.requests // 5
+            return array([array([
+                integer(i), integer(1500000000 + i), integer(10000 + i),
+                array([bulk('get'), bulk('user:%d' % i)])])
+                for i in range(newest - 1, max(-1, newest - 1 - count), -1)])
+        return error('unknown command \'%s\'' % name)
+
+    def key_index(self):
+        if not hasattr(self, '_key_index'):
+            self._key_index = dict((key, i) for i, key in enumerate(self.keys))
+        return self._key_index
+
+    def info(self, section):
+        """INFO payload, changing on every call like a live server"""
+        sections = [section] if section else [
+            s for s in SECTIONS if s != 'commandstats']
+        if section == 'all' or section == 'everything':
+            sections = SECTIONS
+
+        payload = []
+        for name in sections:
+            lines = info_section(name, self.requests, self.info_keys)
+            if lines is None:
+                continue
+            payload.append('# %s' % name.capitalize())
+            payload.extend(lines)
+            payload.append('')
+        return '\r\n'.join(payload)
+
+
+def info_section(name, tick, info_keys):
+    if name == 'server':
+        return [
+            'redis_version:3.2.12', 'redis_mode:standalone',
+            'os:Linux 4.4.0-1 x86_64', 'arch_bits:64', 'process_id:1',
+            'tcp_port:6379', 'uptime_in_seconds:%d' % (1000 + tick),
+            'uptime_in_days:0', 'hz:10', 'lru_clock:%d' % (1000 + tick),
+            'executable:/usr/bin/redis-server',
+            'config_file:/etc/redis/redis.conf']
+    if name == 'clients':
+        return [
+            'connected_clients:%d' % (10 + tick % 5),
+            'client_longest_output_list:0', 'client_biggest_input_buf:0',
+            'blocked_clients:0']
+    if name == 'memory':
+        return [
+            'used_memory:%d' % (1000000 + tick), 'used_memory_human:976.56K',
+            'used_memory_rss:2000000', 'used_memory_peak:3000000',
+            'used_memory_lua:37888', 'mem_fragmentation_ratio:1.85',
+            'maxmemory:0', 'maxmemory_policy:noeviction']
+    if name == 'persistence':
+        return [
+            'loading:0', 'rdb_changes_since_last_save:%d' % tick,
+            'rdb_bgsave_in_progress:0', 'rdb_last_save_time:1500000000',
+            'rdb_last_bgsave_status:ok', 'aof_enabled:0',
+            'aof_rewrite_in_progress:0']
+    if name == 'stats':
+        return [
+            'total_connections_received:%d' % (100 + tick),
+            'total_commands_processed:%d' % (10000 + tick * 50),
+            'instantaneous_ops_per_sec:%d' % (tick % 100),
+            'total_net_input_bytes:%d' % (500000 + tick * 20),
+            'total_net_output_bytes:%d' % (900000 + tick * 80),
+            'rejected_connections:0', 'expired_keys:%d' % tick,
+            'evicted_keys:0', 'keyspace_hits:%d' % (tick * 3),
+            'keyspace_misses:%d' % tick, 'pubsub_channels:0',
+            'pubsub_patterns:0', 'latest_fork_usec:250']
+    if name == 'replication':
+        return [
+            'role:master', 'connected_slaves:1',
+            'slave0:ip=10.0.0.2,port=6379,state=online,offset=%d,lag=0'
+            % (5000 + tick),
+            'master_repl_offset:%d' % (5000 + tick),
+            'repl_backlog_active:1', 'repl_backlog_size:1048576',
+            'repl_backlog_first_byte_offset:2',
+            'repl_backlog_histlen:%d' % (5000 + tick)]
+    if name == 'cpu':
+        return [
+            'used_cpu_sys:%.2f' % (1 + tick * 0.01),
+            'used_cpu_user:%.2f' % (2 + tick * 0.01),
+            'used_cpu_sys_children:0.00', 'used_cpu_user_children:0.00']
+    if name == 'commandstats':
+        return [
+            'cmdstat_cmd%d:calls=%d,usec=%d,usec_per_call=%.2f'
+            % (i, (i + 1) * tick, (i + 1) * tick * 3, 3.0)
+            for i in range(max(1, info_keys // 2))]
+    if name == 'keyspace':
+        return [
+            'db%d:keys=%d,expires=0,avg_ttl=0' % (i, 100 + i)
+            for i in range(max(1, info_keys // 10))]
+    return None
+
+
+# RESP helpers
+def bulk(text):
+    data = text.encode('utf-8')
+    return b'$' + str(len(data)).encode() + b'\r\n' + data + b'\r\n'
+
+
+def array(items):
+    return b'*' + str(len(items)).encode() + b'\r\n' + b''.join(items)
+
+
+def integer(value):
+    return b':' + str(value).encode() + b'\r\n'
+
+
+def error(text):
+    return ('-ERR %s\r\n' % text).encode('utf-8')
+
+
+def parse_command(buf):
+    """
+    Split one inline or RESP array command off buf.
+    Returns (args, rest), or (None, buf) if the command is incomplete.
+    """
+    if not buf:
+        return None, buf
+
+    if buf[:1] != b'*':
+        line, sep, rest = buf.partition(b'\r\n')
+        if not sep:
+            return None, buf
+        return line.decode('utf-8').split(), rest
+
+    line, sep, rest = buf.partition(b'\r\n')
+    if not sep:
+        return None, buf
+    args = []
+    for _ in range(int(line[1:])):
+        header, sep, rest = rest.partition(b'\r\n')
+        if not sep:
+            return None, buf
+        length = int(header[1:])
+        if len(rest) < length + 2:
+            return None, buf
+        args.append(rest[:length].decode('utf-8'))
+        rest = rest[length + 2:]
+    return args, rest
+
+
+if __name__ == '__main__':
+    server = FakeRedisServer().start()
+    print('Fake redis listening on %s:%d' % (server.host, server.ports[0]))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()